@@ -0,0 +1,68 @@
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, insert, select
+
+from core.database import engine
+from core.migration import backfill_latest_prices, backfill_rollups, initialize_database
+from core.models import PriceHistoryModel, ProductModel
+
+INSERT_BATCH_SIZE = 5000
+
+def generate_database(
+    products: int,
+    history_per_product: int = 24,
+    url_for: Callable[[int], str] = lambda i: f"http://127.0.0.1:8765/generic/{i}",
+    selector_for: Callable[[int], Optional[str]] = lambda i: None,
+    current_price: Optional[Callable[[int], float]] = None,
+    seed: int = 0,
+):
+    """
+    Fills the configured database (point PRICE_TRACKER_DB_URL at a scratch
+    file) with products and hourly price history, then backfills latest
+    prices and rollups the same way a migrated database gets them.
+
+    current_price gives each product's latest price, e.g. what the fake
+    store serves, so a benchmark cycle sees (and notifies about) no changes.
+    """
+    initialize_database()
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(ProductModel.__table__)).scalar():
+            return
+
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(hours=history_per_product)
+    product_rows, history_rows = [], []
+    with engine.begin() as conn:
+        for product_id in range(1, products + 1):
+            product_rows.append({
+                "id": product_id,
+                "name": f"Product {product_id}",
+                "url": url_for(product_id),
+                "selector": selector_for(product_id),
+            })
+            # Hourly checks stored as runs of unchanged prices; prices change now and then
+            run = None
+            for hour in range(history_per_product):
+                ts = start + timedelta(hours=hour)
+                if run is None or rng.random() < 0.1:
+                    price = round(rng.uniform(10, 1000) if run is None else run["price"] * rng.uniform(0.9, 1.1), 2)
+                    run = {"product_id": product_id, "price": price, "timestamp": ts, "last_seen": ts}
+                    history_rows.append(run)
+                else:
+                    run["last_seen"] = ts
+            if current_price and run["price"] != current_price(product_id):
+                ts = start + timedelta(hours=history_per_product)
+                history_rows.append({"product_id": product_id, "price": current_price(product_id), "timestamp": ts, "last_seen": ts})
+            if len(history_rows) >= INSERT_BATCH_SIZE:
+                conn.execute(insert(ProductModel.__table__), product_rows)
+                conn.execute(insert(PriceHistoryModel.__table__), history_rows)
+                product_rows, history_rows = [], []
+        if product_rows:
+            conn.execute(insert(ProductModel.__table__), product_rows)
+        if history_rows:
+            conn.execute(insert(PriceHistoryModel.__table__), history_rows)
+
+    backfill_latest_prices()
+    backfill_rollups()
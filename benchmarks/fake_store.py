@@ -0,0 +1,143 @@
+import argparse
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# Page layouts: where the price lives and how it is formatted
+PRICE_MARKUP = {
+    "trendyol": '<div class="pr-bx-w"><span class="prc-dsc">{price} TL</span></div>',
+    "generic": '<div class="price"><span class="amount">${price}</span></div>',
+}
+
+FILLER = (
+    '<div class="card"><a href="/p/{n}">Related product {n}</a>'
+    '<span class="badge">Free shipping</span><p>Lorem ipsum dolor sit amet, '
+    'consectetur adipiscing elit, sed do eiusmod tempor incididunt.</p></div>\n'
+)
+
+_PATH_RE = re.compile(r"^/(trendyol|generic)/(\d+)")
+
+class StoreConfig:
+    def __init__(
+        self,
+        page_bytes: int = 200_000,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        price_position: float = 0.2,
+        etag: bool = True,
+    ):
+        self.page_bytes = page_bytes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.price_position = price_position
+        self.etag = etag
+
+def product_price(product_id: int) -> str:
+    return f"{100 + product_id % 900}.{product_id % 100:02d}"
+
+def render_page(kind: str, product_id: int, config: StoreConfig) -> bytes:
+    """Synthetic product page of roughly config.page_bytes with the price at price_position."""
+    price = PRICE_MARKUP[kind].format(price=product_price(product_id))
+    filler_count = max(1, config.page_bytes // len(FILLER))
+    before = int(filler_count * config.price_position)
+    parts = ["<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Product</title></head><body>\n"]
+    parts.extend(FILLER.format(n=n) for n in range(before))
+    parts.append(price)
+    parts.extend(FILLER.format(n=n) for n in range(before, filler_count))
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+class FakeStoreHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StoreConfig = StoreConfig()
+    pages: Dict[str, bytes] = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        config = self.config
+        if config.latency:
+            time.sleep(config.latency)
+        m = _PATH_RE.match(self.path)
+        if not m:
+            return self._send(404, b"not found")
+        if config.error_rate and random.random() < config.error_rate:
+            return self._send(503, b"unavailable")
+
+        key = f"{m.group(1)}/{m.group(2)}"
+        with self.lock:
+            page = self.pages.get(key)
+            if page is None:
+                page = self.pages[key] = render_page(m.group(1), int(m.group(2)), config)
+        etag = f'"{hash(key) & 0xffffffff:x}"'
+        if config.etag and self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"")
+        self._send(200, page, etag if config.etag else None)
+
+    def _send(self, status: int, body: bytes, etag: Optional[str] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Streaming extraction closes the connection once it has the price
+                pass
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeStore:
+    """Local HTTP server serving synthetic Trendyol-style and generic product pages."""
+
+    def __init__(self, config: Optional[StoreConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (FakeStoreHandler,), {"config": config or StoreConfig(), "pages": {}})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, product_id: int) -> str:
+        kind = "trendyol" if product_id % 2 else "generic"
+        return f"{self.base_url}/{kind}/{product_id}"
+
+    def selector_for(self, product_id: int) -> Optional[str]:
+        """The selector a user would enter; Trendyol's own selectors only kick in on trendyol.com."""
+        return "span.prc-dsc" if product_id % 2 else None
+
+    def start(self) -> "FakeStore":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic product pages.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--page-bytes", type=int, default=200_000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--price-position", type=float, default=0.2, help="Price location as a fraction of the page")
+    args = parser.parse_args()
+    store = FakeStore(
+        StoreConfig(args.page_bytes, args.latency, args.error_rate, args.price_position),
+        port=args.port,
+    )
+    print(f"Serving fake store on {store.base_url} (/trendyol/<id>, /generic/<id>)")
+    try:
+        store.server.serve_forever()
+    except KeyboardInterrupt:
+        store.stop()
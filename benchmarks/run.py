@@ -0,0 +1,307 @@
+"""
+Offline benchmarks for the scraper and the database.
+
+Runs against a local fake store (benchmarks/fake_store.py) and scratch
+databases of generated products, so results are comparable between runs.
+Each database size runs in its own subprocess with PRICE_TRACKER_DB_URL
+pointed at a scratch file. Results are written to benchmarks/results/ and
+compared with the previous run (or --compare FILE).
+
+    python -m benchmarks.run                    # 1k and 10k products
+    python -m benchmarks.run --sizes 1000,10000,100000
+    python -m benchmarks.run --quick            # small smoke run
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = "1000,10000"
+REGRESSION_THRESHOLD = 0.10
+
+# Metrics where a larger value is better; everything else is a duration
+HIGHER_IS_BETTER = ("per_sec",)
+
+PRICE_SAMPLES = ["1.299,99 TL", "$1,299.99", "€ 49,90", "12.345 TL", "199.00", "Price: 7,50 €"]
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _latency_stats(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+# Benchmarks (run inside a worker process)
+
+def bench_parse_price(iterations: int) -> Dict[str, float]:
+    from core.parsing import parse_price
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        parse_price(PRICE_SAMPLES[i % len(PRICE_SAMPLES)])
+    elapsed = time.perf_counter() - started
+    return {"calls_per_sec": iterations / elapsed}
+
+async def bench_fetch_price(store, requests: int) -> Dict[str, float]:
+    from core.scraper import ScraperSession, fetch_price
+
+    latencies, failures = [], 0
+    # No validator cache: every request downloads and parses the page
+    async with ScraperSession() as session:
+        for i in range(1, requests + 1):
+            started = time.perf_counter()
+            _, price = await fetch_price(store.url_for(i), store.selector_for(i), session)
+            latencies.append(time.perf_counter() - started)
+            failures += price is None
+    return {**_latency_stats(latencies), "failures": failures}
+
+async def bench_scrape_multiple(store, urls: int) -> Dict[str, float]:
+    from core.scraper import ScraperSession, scrape_multiple
+
+    items = [(i, store.url_for(i), store.selector_for(i)) for i in range(1, urls + 1)]
+    async with ScraperSession() as session:
+        started = time.perf_counter()
+        results = await scrape_multiple(items, session)
+        elapsed = time.perf_counter() - started
+    return {
+        "urls_per_sec": urls / elapsed,
+        "seconds": elapsed,
+        "failures": sum(1 for _, price in results if price is None),
+    }
+
+async def bench_check_all_prices(size: int) -> Dict[str, float]:
+    from core.repository import AsyncRepository
+    from services.scheduler import PriceScheduler
+
+    repository = AsyncRepository()
+    scheduler = PriceScheduler(repository=repository)
+    try:
+        started = time.perf_counter()
+        await scheduler.check_all_prices()
+        elapsed = time.perf_counter() - started
+    finally:
+        await scheduler.close()
+        repository.shutdown()
+    return {"products_per_sec": size / elapsed, "seconds": elapsed}
+
+def bench_load_data(repeats: int) -> Dict[str, float]:
+    """list_products_with_latest plus filling the table model, as MainWindow.load_data does."""
+    from core.database import SessionLocal
+    from core.repository import list_products_with_latest
+
+    model = None
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt6.QtWidgets import QApplication
+        from ui.product_table import ProductTableModel
+
+        app = QApplication.instance() or QApplication([])  # noqa: F841
+        model = ProductTableModel()
+    except ImportError:
+        pass
+
+    query, fill = [], []
+    for _ in range(repeats):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            rows = list_products_with_latest(db)
+            query.append(time.perf_counter() - started)
+        finally:
+            db.close()
+        if model is not None:
+            started = time.perf_counter()
+            model.load(rows)
+            fill.append(time.perf_counter() - started)
+
+    result = {"query_ms": min(query) * 1000}
+    if fill:
+        result["model_load_ms"] = min(fill) * 1000
+    return result
+
+def run_network(args) -> Dict[str, Dict[str, float]]:
+    from benchmarks.fake_store import FakeStore, StoreConfig
+
+    store = FakeStore(StoreConfig(args.page_bytes, args.latency, args.error_rate)).start()
+    try:
+        return {
+            "parse_price": bench_parse_price(args.parse_iterations),
+            "fetch_price": asyncio.run(bench_fetch_price(store, args.fetch_requests)),
+            "scrape_multiple": asyncio.run(bench_scrape_multiple(store, args.scrape_urls)),
+        }
+    finally:
+        store.stop()
+
+def run_database(args) -> Dict[str, Dict[str, float]]:
+    from benchmarks.datagen import generate_database
+    from benchmarks.fake_store import FakeStore, StoreConfig, product_price
+    from core.parsing import parse_price
+
+    store = FakeStore(StoreConfig(args.page_bytes, args.latency, args.error_rate)).start()
+    try:
+        started = time.perf_counter()
+        generate_database(
+            args.size, url_for=store.url_for, selector_for=store.selector_for,
+            current_price=lambda i: parse_price(product_price(i)),
+        )
+        results = {"generate": {"seconds": time.perf_counter() - started}}
+        results["load_data"] = bench_load_data(args.load_repeats)
+        if args.size <= args.cycle_limit:
+            results["check_all_prices"] = asyncio.run(bench_check_all_prices(args.size))
+        return results
+    finally:
+        store.stop()
+
+def run_worker(args):
+    # Per-request INFO logs would dominate the timings and flood price_tracker.log
+    logging.disable(logging.INFO)
+    results = run_network(args) if args.size is None else run_database(args)
+    with open(args.out, "w") as f:
+        json.dump(results, f)
+
+# Orchestration (parent process)
+
+def bench_daemon_startup(scratch: str, repeats: int = 3) -> Dict[str, float]:
+    """Wall time of `main.py daemon --startup-only`, i.e. interpreter start to a running scheduler."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PRICE_TRACKER_DB_URL"] = f"sqlite:///{os.path.join(scratch, 'startup.db')}"
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(root, "main.py"), "daemon", "--startup-only"],
+            env=env, cwd=scratch, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - started)
+    return {"cold_ms": timings[0] * 1000, "warm_ms": min(timings[1:] or timings) * 1000}
+
+def _spawn(args, size: Optional[int], scratch: str) -> Dict[str, Dict[str, float]]:
+    out = os.path.join(scratch, f"result_{size or 'network'}.json")
+    env = dict(os.environ)
+    env["PRICE_TRACKER_DB_URL"] = f"sqlite:///{os.path.join(scratch, f'bench_{size or 0}.db')}"
+    # Every fake product lives on one host; per-host pacing would only measure the limiter
+    env["PRICE_TRACKER_HOST_RATE"] = str(args.host_rate)
+    env["PRICE_TRACKER_LOG_FILE"] = os.path.join(scratch, "benchmark.log")
+    cmd = [
+        sys.executable, "-m", "benchmarks.run", "--worker", "--out", out,
+        "--page-bytes", str(args.page_bytes), "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate), "--parse-iterations", str(args.parse_iterations),
+        "--fetch-requests", str(args.fetch_requests), "--scrape-urls", str(args.scrape_urls),
+        "--load-repeats", str(args.load_repeats), "--cycle-limit", str(args.cycle_limit),
+    ]
+    if size is not None:
+        cmd += ["--size", str(size)]
+    subprocess.run(cmd, env=env, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with open(out) as f:
+        return json.load(f)
+
+def _flatten(results: Dict) -> Dict[str, float]:
+    flat = {}
+    for group, benches in results.items():
+        for bench, metrics in benches.items():
+            for metric, value in metrics.items():
+                flat[f"{group}/{bench}/{metric}"] = value
+    return flat
+
+def _latest_result() -> Optional[str]:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json"))
+    return os.path.join(RESULTS_DIR, files[-1]) if files else None
+
+def compare(current: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Prints a metric-by-metric comparison; returns the regressed metric names."""
+    regressions = []
+    now, before = _flatten(current), _flatten(baseline)
+    for key in sorted(now):
+        if key not in before or key.endswith(("failures", "generate/seconds", "cold_ms")) or not before[key]:
+            continue
+        change = (now[key] - before[key]) / before[key]
+        better = key.endswith(HIGHER_IS_BETTER) == (change > 0)
+        flag = ""
+        if abs(change) > threshold and not better:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"  {key:50} {before[key]:12.2f} -> {now[key]:12.2f} ({change:+.0%}){flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scraper and database benchmarks.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated product counts")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and request counts")
+    parser.add_argument("--compare", help="Baseline result file (default: latest saved run)")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--page-bytes", type=int, default=200_000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--host-rate", type=float, default=0.0, help="Per-host requests/second (0 = unlimited)")
+    parser.add_argument("--parse-iterations", type=int, default=100_000)
+    parser.add_argument("--fetch-requests", type=int, default=200)
+    parser.add_argument("--scrape-urls", type=int, default=1000)
+    parser.add_argument("--load-repeats", type=int, default=3)
+    parser.add_argument("--cycle-limit", type=int, default=10_000, help="Largest size that runs a full check_all_prices cycle")
+    # Internal: run one group of benchmarks in this process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return run_worker(args)
+
+    if args.quick:
+        args.sizes = "200"
+        args.parse_iterations = 10_000
+        args.fetch_requests = 20
+        args.scrape_urls = 100
+        args.page_bytes = 50_000
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    config = {k: getattr(args, k) for k in ("page_bytes", "latency", "error_rate", "host_rate", "fetch_requests", "scrape_urls")}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="price_tracker_bench_") as scratch:
+        print("Running network benchmarks...")
+        results["network"] = _spawn(args, None, scratch)
+        results["network"]["daemon_startup"] = bench_daemon_startup(scratch)
+        for size in sizes:
+            print(f"Running database benchmarks with {size} products...")
+            results[f"db_{size}"] = _spawn(args, size, scratch)
+
+    for group, benches in results.items():
+        print(f"\n[{group}]")
+        for bench, metrics in benches.items():
+            print(f"  {bench:18} " + ", ".join(f"{k}={v:.2f}" for k, v in metrics.items()))
+
+    baseline_path = args.compare or _latest_result()
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"\nNote: {baseline_path} was run with a different configuration.")
+        print(f"\nCompared with {baseline_path}:")
+        regressions = compare(results, baseline["results"])
+        print(f"{len(regressions)} regression(s) over {REGRESSION_THRESHOLD:.0%}.")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        with open(path, "w") as f:
+            json.dump({"created": datetime.now().isoformat(), "config": config, "results": results}, f, indent=2)
+        print(f"\nSaved results to {path}")
+
+if __name__ == "__main__":
+    main()
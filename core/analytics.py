@@ -0,0 +1,339 @@
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import String, func, select, type_coerce
+
+from core.database import engine
+from core.models import PriceHistoryModel, ProductModel
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+# Rows per chunk when streaming price_history into arrays
+CHUNK_ROWS = 100000
+
+# Windows for catalog statistics
+LOW_WINDOW_DAYS = 90
+SHORT_AVERAGE_DAYS = 7
+LONG_AVERAGE_DAYS = 30
+CHANGE_DAYS = 7
+# A price this far below the long average counts as a drop
+DROP_PERCENT = 10.0
+# Weight of a run that was seen only once, so single observations still count in averages
+POINT_WEIGHT_SECONDS = 3600.0
+
+# Columns of an exported history (file names in a .npy directory, column names in Parquet)
+EXPORT_COLUMNS = ("product_id", "first_seen", "last_seen", "price")
+
+class HistoryColumns(NamedTuple):
+    """
+    Price history as parallel arrays, sorted by product and time. Each row
+    is a run of one price from first_seen to last_seen (seconds since the
+    epoch, UTC).
+    """
+    product_id: np.ndarray
+    first_seen: np.ndarray
+    last_seen: np.ndarray
+    price: np.ndarray
+
+class CatalogStats(NamedTuple):
+    """Per-product statistics as parallel arrays (NaN where a product has no data in a window)."""
+    product_id: np.ndarray
+    current: np.ndarray
+    low: np.ndarray  # over LOW_WINDOW_DAYS
+    high: np.ndarray
+    avg_short: np.ndarray  # time-weighted, over SHORT_AVERAGE_DAYS
+    avg_long: np.ndarray  # time-weighted, over LONG_AVERAGE_DAYS
+    change_pct: np.ndarray  # against the price CHANGE_DAYS ago
+    at_low: np.ndarray  # current price is the window's lowest (and the price has moved)
+    drop: np.ndarray  # current price is DROP_PERCENT or more below avg_long
+
+def to_epoch(timestamp: datetime) -> float:
+    """Seconds since the epoch for a naive UTC datetime, as stored in the database."""
+    return (timestamp - datetime(1970, 1, 1)).total_seconds()
+
+def _history_query(since: Optional[datetime], until: Optional[datetime], product_ids: Optional[Sequence[int]]):
+    history = PriceHistoryModel.__table__
+    seen_until = func.coalesce(history.c.last_seen, history.c.timestamp)
+    # Timestamps as stored (text on SQLite): numpy parses them far faster than building datetime objects
+    query = select(
+        history.c.product_id,
+        type_coerce(history.c.timestamp, String),
+        type_coerce(seen_until, String),
+        history.c.price,
+    ).where(history.c.price.isnot(None))
+    if since:
+        query = query.where(seen_until >= since)
+    if until:
+        query = query.where(history.c.timestamp <= until)
+    if product_ids is not None:
+        query = query.where(history.c.product_id.in_(list(product_ids)))
+    return query
+
+def _seconds(values) -> np.ndarray:
+    """Epoch seconds from stored timestamps (ISO strings or datetimes)."""
+    return np.array(values, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+def _chunk(rows) -> HistoryColumns:
+    # Column tuples first; np.array() on SQLAlchemy rows is over 100x slower
+    product_ids, first_seen, last_seen, prices = zip(*rows)
+    return HistoryColumns(
+        np.fromiter(product_ids, np.int64, count=len(rows)),
+        _seconds(first_seen),
+        _seconds(last_seen),
+        np.fromiter(prices, np.float64, count=len(rows)),
+    )
+
+def _stream(conn, query, chunk_rows: int) -> Iterator[HistoryColumns]:
+    history = PriceHistoryModel.__table__
+    ordered = query.order_by(history.c.product_id, history.c.timestamp, history.c.id)
+    result = conn.execution_options(stream_results=True).execute(ordered)
+    for rows in result.partitions(chunk_rows):
+        yield _chunk(rows)
+
+def iter_history_chunks(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    product_ids: Optional[Sequence[int]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[HistoryColumns]:
+    """
+    Streams price history as HistoryColumns chunks of up to chunk_rows
+    rows, without building ORM objects. since keeps runs that were still
+    seen after it; until keeps runs that started before it.
+    """
+    with engine.connect() as conn:
+        yield from _stream(conn, _history_query(since, until, product_ids), chunk_rows)
+
+@contextmanager
+def _snapshot():
+    """
+    A connection holding one read transaction, so consecutive queries see
+    the same data even while the scheduler or maintenance write (WAL).
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            # pysqlite only opens transactions for writes; without this every SELECT sees the latest data
+            conn.exec_driver_sql("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+def _fill(conn, query, chunk_rows: int, allocate) -> int:
+    """
+    Counts the rows, allocates the output columns and streams the chunks
+    into them. Run it in a _snapshot() so the count matches the rows.
+    """
+    total = conn.execute(select(func.count()).select_from(query.subquery())).scalar()
+    columns = allocate(total)
+    filled = 0
+    for chunk in _stream(conn, query, chunk_rows):
+        size = min(len(chunk.price), total - filled)
+        for target, values in zip(columns, chunk):
+            target[filled:filled + size] = values[:size]
+        filled += size
+    return filled
+
+def read_history(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    product_ids: Optional[Sequence[int]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> HistoryColumns:
+    """Loads price history into preallocated arrays, chunk by chunk (see iter_history_chunks)."""
+    columns: List[np.ndarray] = []
+
+    def allocate(total):
+        columns.extend((np.empty(total, np.int64), np.empty(total), np.empty(total), np.empty(total)))
+        return columns
+
+    with _snapshot() as conn:
+        filled = _fill(conn, _history_query(since, until, product_ids), chunk_rows, allocate)
+    return HistoryColumns(*(column[:filled] for column in columns))
+
+def _window_weights(history: HistoryColumns, start: float, end: float) -> np.ndarray:
+    """Seconds each run overlaps [start, end] (at least POINT_WEIGHT_SECONDS), 0 outside it."""
+    overlap = np.minimum(history.last_seen, end) - np.maximum(history.first_seen, start)
+    inside = (history.last_seen >= start) & (history.first_seen <= end)
+    return np.where(inside, np.maximum(overlap, POINT_WEIGHT_SECONDS), 0.0)
+
+def _weighted_mean(history: HistoryColumns, weights: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    total = np.add.reduceat(weights, starts)
+    weighted = np.add.reduceat(weights * history.price, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, weighted / total, np.nan)
+
+def _price_at(history: HistoryColumns, when: float, starts: np.ndarray) -> np.ndarray:
+    """Price in effect at when per product: the last run started by then, else the first run."""
+    index = np.where(history.first_seen <= when, np.arange(len(history.price)), -1)
+    latest = np.maximum.reduceat(index, starts)
+    return history.price[np.where(latest >= starts, latest, starts)]
+
+def catalog_stats(
+    history: HistoryColumns,
+    now: Optional[datetime] = None,
+    low_window_days: float = LOW_WINDOW_DAYS,
+    short_days: float = SHORT_AVERAGE_DAYS,
+    long_days: float = LONG_AVERAGE_DAYS,
+    change_days: float = CHANGE_DAYS,
+    drop_percent: float = DROP_PERCENT,
+) -> CatalogStats:
+    """
+    Computes statistics for every product in history at once. Averages are
+    weighted by how long each price was seen, so a price that held for a
+    week counts more than one seen for an hour.
+    """
+    if not len(history.price):
+        empty = np.empty(0)
+        return CatalogStats(np.empty(0, np.int64), *([empty] * 6), np.empty(0, bool), np.empty(0, bool))
+    end = to_epoch(now or datetime.utcnow())
+    day = 86400.0
+
+    product_ids, starts = np.unique(history.product_id, return_index=True)
+    last_rows = np.append(starts[1:], len(history.price)) - 1
+    current = history.price[last_rows]
+
+    in_window = _window_weights(history, end - low_window_days * day, end) > 0
+    low = np.minimum.reduceat(np.where(in_window, history.price, np.inf), starts)
+    high = np.maximum.reduceat(np.where(in_window, history.price, -np.inf), starts)
+    low[np.isinf(low)] = np.nan
+    high[np.isinf(high)] = np.nan
+
+    avg_short = _weighted_mean(history, _window_weights(history, end - short_days * day, end), starts)
+    avg_long = _weighted_mean(history, _window_weights(history, end - long_days * day, end), starts)
+
+    before = _price_at(history, end - change_days * day, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        change_pct = np.where(before > 0, (current - before) / before * 100, np.nan)
+    with np.errstate(invalid="ignore"):
+        at_low = (current <= low) & (low < high)
+        drop = current <= avg_long * (1 - drop_percent / 100)
+    return CatalogStats(product_ids, current, low, high, avg_short, avg_long, change_pct, at_low, drop)
+
+def load_catalog_stats(now: Optional[datetime] = None, chunk_rows: int = CHUNK_ROWS) -> CatalogStats:
+    """catalog_stats over the history needed for its windows, read from the database."""
+    now = now or datetime.utcnow()
+    since = now - timedelta(days=max(LOW_WINDOW_DAYS, LONG_AVERAGE_DAYS, CHANGE_DAYS))
+    return catalog_stats(read_history(since=since, chunk_rows=chunk_rows), now)
+
+def export_history(
+    path: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> int:
+    """
+    Writes price history to a columnar file and returns the row count.
+    A path ending in .parquet is written with pyarrow (one row group per
+    chunk); any other path becomes a directory with one .npy file per
+    column, which load_history memory-maps. Memory use stays at one chunk.
+    """
+    query = _history_query(since, until, None)
+    if path.endswith(".parquet"):
+        return _export_parquet(path, query, chunk_rows)
+
+    os.makedirs(path, exist_ok=True)
+    dtypes = (np.int64, np.float64, np.float64, np.float64)
+    columns: List[np.ndarray] = []
+
+    def allocate(total):
+        for name, dtype in zip(EXPORT_COLUMNS, dtypes):
+            columns.append(np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype, shape=(total,)
+            ))
+        return columns
+
+    with _snapshot() as conn:
+        written = _fill(conn, query, chunk_rows, allocate)
+    for name, column in zip(EXPORT_COLUMNS, columns):
+        column.flush()
+        if written < len(column):
+            # Never leave uninitialized rows behind if fewer rows arrived than were counted
+            column_path = os.path.join(path, f"{name}.npy")
+            np.save(column_path + ".tmp.npy", column[:written])
+            os.replace(column_path + ".tmp.npy", column_path)
+    logger.info("Exported %s history rows to %s.", written, path)
+    return written
+
+def _export_parquet(path: str, query, chunk_rows: int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+
+    schema = pa.schema([
+        ("product_id", pa.int64()),
+        ("first_seen", pa.timestamp("us")),
+        ("last_seen", pa.timestamp("us")),
+        ("price", pa.float64()),
+    ])
+    written = 0
+    with engine.connect() as conn, pq.ParquetWriter(path, schema) as writer:
+        for chunk in _stream(conn, query, chunk_rows):
+            writer.write_table(pa.table({
+                "product_id": chunk.product_id,
+                "first_seen": (chunk.first_seen * 1e6).round().astype("datetime64[us]"),
+                "last_seen": (chunk.last_seen * 1e6).round().astype("datetime64[us]"),
+                "price": chunk.price,
+            }, schema=schema))
+            written += len(chunk.price)
+    logger.info("Exported %s history rows to %s.", written, path)
+    return written
+
+def load_history(path: str) -> HistoryColumns:
+    """
+    Reads an export from export_history. .npy directories are memory-mapped
+    read-only, so even very large exports open instantly.
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow).")
+        table = pq.read_table(path, columns=list(EXPORT_COLUMNS))
+        seconds = [
+            table.column(name).to_numpy().astype("datetime64[us]").astype(np.int64) / 1e6
+            for name in ("first_seen", "last_seen")
+        ]
+        return HistoryColumns(
+            table.column("product_id").to_numpy().astype(np.int64), seconds[0], seconds[1],
+            table.column("price").to_numpy().astype(np.float64),
+        )
+    return HistoryColumns(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in EXPORT_COLUMNS))
+
+def report(stats: CatalogStats, limit: int = 20) -> List[str]:
+    """Lines describing the largest drops, with product names."""
+    order = np.argsort(np.nan_to_num(stats.change_pct, nan=np.inf))
+    flagged = [i for i in order if stats.drop[i] or stats.at_low[i]][:limit]
+    if not flagged:
+        return ["No price drops."]
+    ids = [int(stats.product_id[i]) for i in flagged]
+    products = ProductModel.__table__
+    with engine.connect() as conn:
+        names = dict(conn.execute(select(products.c.id, products.c.name).where(products.c.id.in_(ids))).all())
+    lines = []
+    for i, product_id in zip(flagged, ids):
+        lines.append(
+            f"{names.get(product_id, product_id)}: {stats.current[i]:.2f} "
+            f"({stats.change_pct[i]:+.1f}% in {CHANGE_DAYS}d, {LONG_AVERAGE_DAYS}d avg {stats.avg_long[i]:.2f}, "
+            f"{LOW_WINDOW_DAYS}d low {stats.low[i]:.2f}{', new low' if stats.at_low[i] else ''})"
+        )
+    return lines
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command == "report":
+        source = sys.argv[2] if len(sys.argv) > 2 else None
+        stats = catalog_stats(load_history(source)) if source else load_catalog_stats()
+        print(f"{len(stats.product_id)} products, {int(stats.drop.sum())} drops, {int(stats.at_low.sum())} at their low.")
+        print("\n".join(report(stats)))
+    elif command == "export" and len(sys.argv) > 2:
+        export_history(sys.argv[2])
+    else:
+        logger.error("Unknown command: %s", " ".join(sys.argv[1:]))
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Set
+
+from core.database import SessionLocal
+from core.models import PageCacheModel
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+MAX_CACHE_ENTRIES = 10000
+
+class CacheEntry(NamedTuple):
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: Optional[str]
+    text: Optional[str]
+    price: Optional[float]
+    last_used: datetime
+
+def cache_key(url: str, selector: Optional[str]) -> str:
+    return f"{url}\n{selector or ''}"
+
+class ValidatorCache:
+    """
+    Per-URL validator cache (ETag, Last-Modified and body hash) with the
+    last price extracted for that page, persisted in the page_cache table.
+
+    Entries are kept in LRU order and bounded by max_entries; the least
+    recently used ones are evicted (and deleted on the next save).
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._evicted: Set[str] = set()
+        self._loaded = False
+
+    def load(self):
+        """Loads persisted state once; called lazily on first use otherwise."""
+        if not self._loaded:
+            self._load()
+
+    def _load(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(PageCacheModel).order_by(PageCacheModel.last_used.asc()).all()
+            for row in rows:
+                self._entries[row.key] = CacheEntry(
+                    row.url, row.etag, row.last_modified, row.body_hash,
+                    row.text, row.price, row.last_used or datetime.utcnow(),
+                )
+            logger.info("Loaded %s page cache entries.", len(rows))
+        except Exception as e:
+            logger.error("Error loading page cache: %s", e)
+        finally:
+            db.close()
+        self._loaded = True
+        self._evict()
+
+    def get(self, url: str, selector: Optional[str]) -> Optional[CacheEntry]:
+        if not self._loaded:
+            self._load()
+        return self._entries.get(cache_key(url, selector))
+
+    def hit(self, url: str, selector: Optional[str]) -> Optional[CacheEntry]:
+        """Count a hit and mark the entry as recently used."""
+        self.hits += 1
+        key = cache_key(url, selector)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry = entry._replace(last_used=datetime.utcnow())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._dirty.add(key)
+        return entry
+
+    def miss(self):
+        self.misses += 1
+
+    def store(
+        self,
+        url: str,
+        selector: Optional[str],
+        etag: Optional[str],
+        last_modified: Optional[str],
+        body_hash: Optional[str],
+        text: Optional[str],
+        price: Optional[float],
+    ):
+        if not self._loaded:
+            self._load()
+        key = cache_key(url, selector)
+        self._entries[key] = CacheEntry(url, etag, last_modified, body_hash, text, price, datetime.utcnow())
+        self._entries.move_to_end(key)
+        self._dirty.add(key)
+        self._evicted.discard(key)
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            self._dirty.discard(key)
+            self._evicted.add(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def save(self):
+        """Persist changed entries and drop evicted ones."""
+        if not self._dirty and not self._evicted:
+            return
+        # Swap the change sets out first: saving may run on the DB thread
+        # while fetches keep updating the cache on the event loop.
+        dirty, self._dirty = self._dirty, set()
+        evicted, self._evicted = self._evicted, set()
+        db = SessionLocal()
+        try:
+            if evicted:
+                db.query(PageCacheModel).filter(
+                    PageCacheModel.key.in_(list(evicted))
+                ).delete(synchronize_session=False)
+            for key in dirty:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                db.merge(PageCacheModel(
+                    key=key, url=entry.url, etag=entry.etag, last_modified=entry.last_modified,
+                    body_hash=entry.body_hash, text=entry.text, price=entry.price,
+                    last_used=entry.last_used,
+                ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._dirty |= dirty
+            self._evicted |= evicted
+            logger.error("Error saving page cache: %s", e)
+        finally:
+            db.close()
@@ -1,12 +1,40 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///price_tracker.db"
+# Override with PRICE_TRACKER_DB_URL, e.g. to point benchmarks at a scratch database
+DATABASE_URL = os.environ.get("PRICE_TRACKER_DB_URL", "sqlite:///price_tracker.db")
+
+# Applied to every new SQLite connection. WAL lets the GUI read while the
+# scheduler writes; busy_timeout waits for a lock instead of failing.
+# auto_vacuum only takes effect on new databases (existing ones switch on
+# their next VACUUM) and lets maintenance free space in small steps.
+SQLITE_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 30000,
+    "cache_size": -64000,  # KiB, i.e. 64 MB
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
 
-engine = create_engine(DATABASE_URL, echo=False)
+# check_same_thread=False: sessions are used from the repository's DB thread
+connect_args = {"timeout": 30, "check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,229 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from core.parsing import parse_price
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+# Compound selector parts: tag, .class, #id, [attr], [attr=value]
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<tag>^[a-zA-Z][\w-]*|^\*)
+    | \.(?P<cls>[\w-]+)
+    | \#(?P<id>[\w-]+)
+    | \[\s*(?P<attr>[\w-]+)\s*(?:=\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<bare>[\w-]+))\s*)?\]
+    """,
+    re.VERBOSE,
+)
+
+class Compound(NamedTuple):
+    tag: Optional[str]
+    classes: Tuple[str, ...]
+    element_id: Optional[str]
+    attrs: Tuple[Tuple[str, Optional[str]], ...]
+
+    def matches(self, el) -> bool:
+        if self.tag is not None and el.tag != self.tag:
+            return False
+        if self.element_id is not None and el.get("id") != self.element_id:
+            return False
+        if self.classes:
+            el_classes = (el.get("class") or "").split()
+            if not all(c in el_classes for c in self.classes):
+                return False
+        for name, value in self.attrs:
+            actual = el.get(name)
+            if actual is None or (value is not None and actual != value):
+                return False
+        return True
+
+def _compile_compound(text: str) -> Optional[Compound]:
+    tag, classes, element_id, attrs = None, [], None, []
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            return None
+        if m.group("tag"):
+            if pos != 0:
+                return None
+            tag = None if m.group("tag") == "*" else m.group("tag").lower()
+        elif m.group("cls"):
+            classes.append(m.group("cls"))
+        elif m.group("id"):
+            element_id = m.group("id")
+        else:
+            value = next((v for v in (m.group("sq"), m.group("dq"), m.group("bare")) if v is not None), None)
+            attrs.append((m.group("attr").lower(), value))
+        pos = m.end()
+    return Compound(tag, tuple(classes), element_id, tuple(attrs))
+
+class CompiledSelector:
+    """
+    A CSS selector compiled for matching elements as their start tags are parsed.
+
+    Supports compound selectors (tag, class, id, attribute) joined by
+    descendant or child combinators, which covers the built-in selectors
+    and typical user ones.
+    """
+
+    def __init__(self, source: str, parts: List[Tuple[str, Compound]]):
+        self.source = source
+        # Right-most compound first
+        self.parts = parts
+
+    def matches(self, el) -> bool:
+        return self._match_from(el, 0)
+
+    def _match_from(self, el, index: int) -> bool:
+        combinator, compound = self.parts[index]
+        if not compound.matches(el):
+            return False
+        if index + 1 == len(self.parts):
+            return True
+        parent = el.getparent()
+        if combinator == ">":
+            return parent is not None and self._match_from(parent, index + 1)
+        while parent is not None:
+            if self._match_from(parent, index + 1):
+                return True
+            parent = parent.getparent()
+        return False
+
+def compile_selector(selector: str) -> Optional[CompiledSelector]:
+    """Returns None for selectors outside the supported subset."""
+    tokens = re.sub(r"\s*>\s*", " > ", selector.strip()).split()
+    if not tokens or tokens[0] == ">" or tokens[-1] == ">":
+        return None
+    parts = []
+    combinator = " "
+    for token in tokens:
+        if token == ">":
+            if combinator == ">":
+                return None
+            combinator = ">"
+            continue
+        compound = _compile_compound(token)
+        if compound is None:
+            return None
+        parts.append((combinator, compound))
+        combinator = " "
+    # Match right-to-left: each compound keeps the combinator linking it to its left neighbour
+    return CompiledSelector(selector, list(reversed(parts)))
+
+def compile_chain(selectors: List[str]) -> Optional[List[CompiledSelector]]:
+    """Compiles a whole selector chain, or returns None if any selector is unsupported."""
+    compiled = []
+    for sel in selectors:
+        c = compile_selector(sel)
+        if c is None:
+            return None
+        compiled.append(c)
+    return compiled
+
+def element_text(el) -> str:
+    text = "".join(t.strip() for t in el.itertext())
+    return text or (el.get("content") or "").strip()
+
+class _ChainMatch:
+    """
+    Matching state of one selector chain. Like select_one, each selector
+    counts only its first match in document order: the candidate is taken
+    when its start tag is seen and its text is read when it ends.
+    """
+
+    def __init__(self, chain: List[CompiledSelector]):
+        self.chain = chain
+        self.candidates: List[Optional[object]] = [None] * len(chain)
+        self.resolved = [False] * len(chain)
+        self.best_index = len(chain)
+        self.best: Tuple[Optional[str], Optional[float]] = (None, None)
+        self.done = False
+
+    def start(self, el):
+        """Records el as the candidate of every selector that has none yet and matches it."""
+        for i in range(self.best_index):
+            if self.candidates[i] is None and self.chain[i].matches(el):
+                self.candidates[i] = el
+
+    def end(self, el) -> bool:
+        """Reads the price of a completed candidate; returns True once the result is final."""
+        for i in range(self.best_index):
+            if self.resolved[i] or self.candidates[i] is not el:
+                continue
+            self.resolved[i] = True
+            text = element_text(el)
+            price = parse_price(text)
+            if price is not None:
+                self.best = (text, price)
+                self.best_index = i
+                break
+        if self.best_index < len(self.chain) and all(self.resolved[:self.best_index]):
+            self.done = True
+        return self.done
+
+    @property
+    def winner(self) -> Optional[str]:
+        if self.best_index < len(self.chain):
+            return self.chain[self.best_index].source
+        return None
+
+class StreamExtractor:
+    """
+    Incremental price extraction over a byte stream.
+
+    Feeds chunks to lxml's pull parser, matches elements as their start
+    tags arrive and reads a candidate's text once it is complete. Gives the
+    same results as extract_prices (selectors tried in order, the first
+    element in document order matched by each selector counts) and reports
+    done as soon as no higher-priority selector can still produce a price,
+    so the caller can stop reading the response.
+
+    Several chains (products tracking the same page with different
+    selectors) share one parse; the extractor is done when all of them are.
+    """
+
+    def __init__(self, chains: List[List[CompiledSelector]], encoding: Optional[str] = None):
+        from lxml import etree
+
+        self.parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding, no_network=True)
+        self.matches = [_ChainMatch(chain) for chain in chains]
+        self.bytes_read = 0
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """Feeds a chunk; returns True once every result is final."""
+        if self.done:
+            return True
+        self.bytes_read += len(chunk)
+        self.parser.feed(chunk)
+        self._consume(self.parser.read_events())
+        return self.done
+
+    def close(self):
+        if not self.done:
+            try:
+                self.parser.close()
+            except Exception as e:
+                logger.debug("Parser close error: %s", e)
+            self._consume(self.parser.read_events())
+            self.done = True
+
+    def _consume(self, events):
+        pending = [m for m in self.matches if not m.done]
+        for event, el in events:
+            if not isinstance(el.tag, str):
+                continue
+            if event == "start":
+                for match in pending:
+                    match.start(el)
+                continue
+            pending = [m for m in pending if not m.end(el)]
+            if not pending:
+                self.done = True
+                return
+
+    def results(self) -> List[Tuple[Optional[str], Optional[float], Optional[str]]]:
+        """(text, price, winning selector) per chain."""
+        return [(m.best[0], m.best[1], m.winner) for m in self.matches]
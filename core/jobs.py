@@ -0,0 +1,151 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from core.database import engine
+from core.models import ProductModel, ScrapeJobModel
+from core.polling import next_check_time
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+# A lease must be renewed (heartbeat) within LEASE_SECONDS or another worker may take the job
+LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = 30
+JOB_BATCH_SIZE = 50
+
+# Jobs whose worker died this many times are dropped and the product backed off
+MAX_ATTEMPTS = 3
+
+# Due products are enqueued until this many jobs are waiting
+QUEUE_TARGET = 500
+
+class JobQueue:
+    """
+    Leased job queue in the scrape_jobs table, shared by worker processes
+    on one or more hosts.
+
+    Workers enqueue due products (at most one job per product), claim
+    batches under a lease token, renew the lease while scraping and delete
+    the jobs when done. A job whose lease expires (crashed or stuck worker)
+    becomes claimable again. Every method is one short transaction.
+    """
+
+    def __init__(self, lease_seconds: int = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS, interval_hours: float = 1):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.interval_hours = interval_hours
+
+    def enqueue_due(self, target: int = QUEUE_TARGET, now: Optional[datetime] = None) -> int:
+        """Queues due products that have no job yet, topping the queue up to target jobs."""
+        now = now or datetime.utcnow()
+        jobs = ScrapeJobModel.__table__
+        products = ProductModel.__table__
+        try:
+            with engine.begin() as conn:
+                queued = conn.execute(select(func.count()).select_from(jobs)).scalar()
+                if queued >= target:
+                    return 0
+                due = select(products.c.id, func.coalesce(products.c.next_check, now)).where(
+                    or_(products.c.next_check.is_(None), products.c.next_check <= now),
+                    ~exists().where(jobs.c.product_id == products.c.id),
+                ).order_by(products.c.next_check.asc().nulls_first(), products.c.priority.desc()).limit(target - queued)
+                result = conn.execute(insert(jobs).from_select(["product_id", "enqueued_at"], due))
+                return result.rowcount or 0
+        except IntegrityError:
+            # Another worker queued the same products first
+            return 0
+
+    def claim(self, owner: str, batch_size: int = JOB_BATCH_SIZE, now: Optional[datetime] = None) -> Tuple[str, List]:
+        """
+        Leases up to batch_size free (or expired) jobs. Returns the lease
+        token and product rows shaped like core.polling.due_products.
+        """
+        now = now or datetime.utcnow()
+        token = uuid.uuid4().hex
+        jobs = ScrapeJobModel.__table__
+        products = ProductModel.__table__
+        claimable = or_(jobs.c.lease_expires.is_(None), jobs.c.lease_expires < now)
+        with engine.begin() as conn:
+            self._drop_exhausted(conn, now)
+            free = (
+                select(jobs.c.id).where(claimable).order_by(jobs.c.id).limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            # The condition is repeated on the update so a job claimed
+            # concurrently (where row locks exist) is not claimed twice
+            conn.execute(
+                update(jobs).where(jobs.c.id.in_(free.scalar_subquery()), claimable).values(
+                    lease_token=token,
+                    lease_owner=owner,
+                    lease_expires=now + timedelta(seconds=self.lease_seconds),
+                    attempts=func.coalesce(jobs.c.attempts, 0) + 1,
+                )
+            )
+            rows = conn.execute(
+                select(
+                    products.c.id, products.c.name, products.c.url, products.c.selector,
+                    products.c.last_price, products.c.last_checked, products.c.priority,
+                    products.c.error_count, products.c.target_price,
+                ).join(jobs, jobs.c.product_id == products.c.id).where(jobs.c.lease_token == token)
+            ).all()
+        return token, rows
+
+    def heartbeat(self, token: str) -> int:
+        """Extends a lease; returns how many jobs are still held under it."""
+        jobs = ScrapeJobModel.__table__
+        with engine.begin() as conn:
+            result = conn.execute(
+                update(jobs).where(jobs.c.lease_token == token)
+                .values(lease_expires=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+        return result.rowcount
+
+    def complete(self, token: str) -> int:
+        """Deletes the jobs still held under token (a job re-leased elsewhere is left alone)."""
+        jobs = ScrapeJobModel.__table__
+        with engine.begin() as conn:
+            return conn.execute(delete(jobs).where(jobs.c.lease_token == token)).rowcount
+
+    def release(self, token: str) -> int:
+        """Gives unfinished jobs back to the queue right away, e.g. on shutdown."""
+        jobs = ScrapeJobModel.__table__
+        with engine.begin() as conn:
+            return conn.execute(
+                update(jobs).where(jobs.c.lease_token == token)
+                .values(lease_token=None, lease_owner=None, lease_expires=None)
+            ).rowcount
+
+    def _drop_exhausted(self, conn, now: datetime):
+        """Drops expired jobs that already failed max_attempts times and backs their products off."""
+        jobs = ScrapeJobModel.__table__
+        products = ProductModel.__table__
+        exhausted = conn.execute(
+            select(jobs.c.id, products.c.id, products.c.priority, products.c.error_count)
+            .join(products, products.c.id == jobs.c.product_id)
+            .where(jobs.c.attempts >= self.max_attempts, jobs.c.lease_expires < now)
+        ).all()
+        if not exhausted:
+            return
+        conn.execute(delete(jobs).where(jobs.c.id.in_([job_id for job_id, *_ in exhausted])))
+        for _, product_id, priority, error_count in exhausted:
+            errors = (error_count or 0) + 1
+            conn.execute(
+                update(products).where(products.c.id == product_id)
+                .values(next_check=next_check_time(now, self.interval_hours, 0.0, priority, errors), error_count=errors)
+            )
+        logger.warning("Dropped %s jobs after %s expired leases.", len(exhausted), self.max_attempts)
+
+    def stats(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.utcnow()
+        jobs = ScrapeJobModel.__table__
+        with engine.connect() as conn:
+            queued, leased, expired = conn.execute(select(
+                func.count(),
+                func.count(jobs.c.lease_expires).filter(jobs.c.lease_expires >= now),
+                func.count(jobs.c.lease_expires).filter(jobs.c.lease_expires < now),
+            )).one()
+        return {"queued": queued, "leased": leased, "expired": expired}
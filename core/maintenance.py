@@ -0,0 +1,384 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, select, text, update
+
+from core.database import engine
+from core.models import PriceHistoryModel, ProductModel
+from core.timeseries import bucket_start
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+COMPACT_BATCH_PRODUCTS = 200
+
+# Retention tiers as "<days>:<resolution>": history older than days keeps one row per
+# resolution bucket (hour, day or week). Rollups keep the full min/max/average.
+RETENTION = os.environ.get("PRICE_TRACKER_RETENTION", "30:day,365:week")
+# Local hours "start-end" in which the scheduler runs maintenance; empty turns it off
+MAINTENANCE_WINDOW = os.environ.get("PRICE_TRACKER_MAINTENANCE_WINDOW", "3-5")
+# Pages freed per incremental vacuum step (one short write transaction each)
+VACUUM_STEP_PAGES = 2000
+# Rows sampled per index by ANALYZE / PRAGMA optimize
+ANALYSIS_LIMIT = 1000
+
+REPORT_TABLES = ("products", "price_history", "price_rollups", "page_cache", "scrape_jobs")
+
+class RetentionTier(NamedTuple):
+    days: float
+    resolution: str
+
+def parse_retention(spec: str) -> List[RetentionTier]:
+    """"30:day,365:week" -> tiers sorted by age."""
+    tiers = []
+    for item in spec.split(","):
+        days, _, resolution = item.strip().partition(":")
+        if not days:
+            continue
+        try:
+            tier = RetentionTier(float(days), resolution.strip())
+            bucket_start(datetime(2000, 1, 1), tier.resolution)
+        except ValueError:
+            logger.warning("Ignoring invalid retention tier: %s", item)
+            continue
+        tiers.append(tier)
+    return sorted(tiers)
+
+def parse_window(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """"3-5" -> (3, 5); None when empty or invalid."""
+    start, _, end = (spec or "").partition("-")
+    try:
+        window = int(start), int(end)
+    except ValueError:
+        if spec:
+            logger.warning("Ignoring invalid maintenance window: %s", spec)
+        return None
+    return window if all(0 <= hour < 24 for hour in window) else None
+
+def window_end(now: datetime, window: Tuple[int, int]) -> datetime:
+    """End of the maintenance window that started last, in local time."""
+    start, end = window
+    deadline = now.replace(hour=end, minute=0, second=0, microsecond=0)
+    if end <= start and now.hour >= start:
+        deadline += timedelta(days=1)
+    return deadline
+
+def database_size() -> Dict[str, int]:
+    """Allocated and free bytes of the SQLite database, plus the file size."""
+    with engine.connect() as conn:
+        if engine.dialect.name != "sqlite":
+            # PostgreSQL only reports the total; its free space is managed by autovacuum
+            size = conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+            return {"bytes": size, "free_bytes": 0, "file_bytes": size}
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        page_count = conn.execute(text("PRAGMA page_count")).scalar()
+        free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+    path = engine.url.database
+    return {
+        "bytes": page_size * page_count,
+        "free_bytes": page_size * free_pages,
+        "file_bytes": os.path.getsize(path) if path and os.path.exists(path) else 0,
+    }
+
+def history_row_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(PriceHistoryModel.__table__)).scalar()
+
+def database_report() -> Dict:
+    """Database size plus row counts of the main tables."""
+    rows = {}
+    with engine.connect() as conn:
+        for table in REPORT_TABLES:
+            rows[table] = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+    return {**database_size(), "rows": rows}
+
+def vacuum_database():
+    """
+    Full VACUUM, which also switches the database to incremental
+    auto-vacuum so later maintenance can return space in small steps.
+    Rewrites the whole file and blocks writers while it runs.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if engine.dialect.name != "sqlite":
+            conn.execute(text("VACUUM"))
+            return
+        conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+def _tier_bucket(timestamp: datetime, cutoffs: List[Tuple[datetime, str]]) -> Optional[Tuple[str, datetime]]:
+    """Bucket of the coarsest tier the row is old enough for; cutoffs run from oldest to newest."""
+    for cutoff, resolution in cutoffs:
+        if timestamp < cutoff:
+            return resolution, bucket_start(timestamp, resolution)
+    return None
+
+def thin_history(conn, product_ids: List[int], tiers: List[RetentionTier], now: datetime) -> Tuple[int, int]:
+    """
+    Applies retention tiers to the products' history: rows old enough for a
+    tier collapse into one row per bucket, keeping the bucket's last price
+    over its whole time span, and neighbouring buckets with the same price
+    merge into one run. Returns (rows updated, rows deleted).
+    """
+    if not tiers:
+        return 0, 0
+    history = PriceHistoryModel.__table__
+    cutoffs = [(now - timedelta(days=tier.days), tier.resolution) for tier in reversed(tiers)]
+    rows = conn.execute(
+        select(history.c.id, history.c.product_id, history.c.price, history.c.timestamp, history.c.last_seen)
+        .where(history.c.product_id.in_(product_ids), history.c.timestamp < cutoffs[-1][0])
+        .order_by(history.c.product_id, history.c.timestamp, history.c.id)
+    )
+    updates, deletes = [], []
+    for _, product_rows in groupby(rows, key=lambda r: r.product_id):
+        # One row per bucket: the bucket's last row, spanning the whole bucket
+        buckets: List[Dict] = []
+        for row_id, _, price, timestamp, last_seen in product_rows:
+            seen = last_seen or timestamp
+            key = _tier_bucket(timestamp, cutoffs)
+            if buckets and buckets[-1]["key"] == key:
+                bucket = buckets[-1]
+                deletes.append({"b_id": bucket["id"]})
+                bucket.update(id=row_id, price=price, stored=(timestamp, last_seen), seen=max(bucket["seen"], seen))
+            else:
+                buckets.append({
+                    "id": row_id, "price": price, "key": key,
+                    "timestamp": timestamp, "seen": seen, "stored": (timestamp, last_seen),
+                })
+        # Neighbouring buckets with the same price become one run
+        kept = None
+        for bucket in buckets + [None]:
+            if kept and bucket and bucket["price"] == kept["price"]:
+                deletes.append({"b_id": bucket["id"]})
+                kept["seen"] = max(kept["seen"], bucket["seen"])
+                continue
+            if kept and (kept["timestamp"], kept["seen"]) != kept["stored"]:
+                updates.append({"b_id": kept["id"], "b_timestamp": kept["timestamp"], "b_seen": kept["seen"]})
+            kept = bucket
+
+    if updates:
+        conn.execute(
+            update(history).where(history.c.id == bindparam("b_id"))
+            .values(timestamp=bindparam("b_timestamp"), last_seen=bindparam("b_seen")),
+            updates,
+        )
+    if deletes:
+        conn.execute(delete(history).where(history.c.id == bindparam("b_id")), deletes)
+    return len(updates), len(deletes)
+
+class MaintenanceRun:
+    """
+    One maintenance pass, split into short steps so callers can interleave
+    other database work: thin history by the retention tiers (a batch of
+    products per step), refresh planner statistics, then return free pages
+    with incremental vacuum. Each step is one short transaction, so readers
+    (WAL) are never blocked and writers wait at most one step.
+
+    Thinning and vacuuming stop at the deadline (local time); statistics
+    are always refreshed. report holds the size and row counts before and
+    after.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[List[RetentionTier]] = None,
+        deadline: Optional[datetime] = None,
+        batch_products: int = COMPACT_BATCH_PRODUCTS,
+        vacuum_step_pages: int = VACUUM_STEP_PAGES,
+    ):
+        self.tiers = parse_retention(RETENTION) if tiers is None else tiers
+        self.deadline = deadline
+        self.batch_products = batch_products
+        self.vacuum_step_pages = vacuum_step_pages
+        self.report: Dict = {}
+        self._phase = "start"
+        self._product_ids: List[int] = []
+        self._now = datetime.utcnow()
+        self._started = 0.0
+
+    def _expired(self) -> bool:
+        return self.deadline is not None and datetime.now() >= self.deadline
+
+    def step(self) -> bool:
+        """Does the next piece of work; returns False once the run is finished."""
+        if self._phase == "start":
+            self._started = time.perf_counter()
+            self.report = {"before": database_report(), "updated": 0, "thinned": 0, "vacuumed_pages": 0, "completed": True}
+            with engine.connect() as conn:
+                products = ProductModel.__table__
+                self._product_ids = [r[0] for r in conn.execute(select(products.c.id).order_by(products.c.id))]
+            self._now = datetime.utcnow()
+            self._phase = "thin"
+        elif self._phase == "thin":
+            if not self._product_ids or not self.tiers or self._expired():
+                if self._product_ids and self.tiers:
+                    self.report["completed"] = False
+                self._phase = "analyze"
+                return True
+            batch, self._product_ids = self._product_ids[:self.batch_products], self._product_ids[self.batch_products:]
+            with engine.begin() as conn:
+                updated, deleted = thin_history(conn, batch, self.tiers, self._now)
+            self.report["updated"] += updated
+            self.report["thinned"] += deleted
+        elif self._phase == "analyze":
+            self._analyze()
+            self._phase = "vacuum"
+        elif self._phase == "vacuum":
+            if self._expired():
+                self.report["completed"] = False
+            if self._expired() or not self._vacuum_step():
+                self._finish()
+                return False
+        return True
+
+    def _analyze(self):
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if engine.dialect.name != "sqlite":
+                conn.execute(text("ANALYZE"))
+                return
+            conn.execute(text(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}"))
+            has_stats = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first()
+            # PRAGMA optimize only re-analyzes tables whose statistics are stale
+            conn.execute(text("PRAGMA optimize" if has_stats else "ANALYZE"))
+
+    def _vacuum_step(self) -> bool:
+        """Frees up to vacuum_step_pages pages; False when there is nothing (more) to free."""
+        if engine.dialect.name != "sqlite":
+            # PostgreSQL's autovacuum reclaims space on its own
+            return False
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+            if not free_pages:
+                return False
+            if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+                logger.info(
+                    "%.1f MB free in the database; run `python -m core.maintenance vacuum` once "
+                    "to enable incremental vacuum.",
+                    free_pages * conn.execute(text("PRAGMA page_size")).scalar() / 1024 / 1024,
+                )
+                return False
+            # sqlite3's execute() steps the pragma once, freeing a single page; executescript runs it to completion
+            conn.connection.dbapi_connection.executescript(f"PRAGMA incremental_vacuum({self.vacuum_step_pages});")
+            conn.execute(text("PRAGMA wal_checkpoint(PASSIVE)"))
+        freed = min(free_pages, self.vacuum_step_pages)
+        self.report["vacuumed_pages"] += freed
+        return freed < free_pages
+
+    def _finish(self):
+        self.report["after"] = database_report()
+        self.report["seconds"] = time.perf_counter() - self._started
+        before, after = self.report["before"], self.report["after"]
+        logger.info(
+            "Maintenance %s in %.1fs: %s history rows thinned, %.1f -> %.1f MB (%.1f MB free); rows %s.",
+            "completed" if self.report["completed"] else "stopped at the end of its window",
+            self.report["seconds"], self.report["thinned"],
+            before["file_bytes"] / 1024 / 1024, after["file_bytes"] / 1024 / 1024, after["free_bytes"] / 1024 / 1024,
+            ", ".join(f"{table} {before['rows'][table]} -> {n}" for table, n in after["rows"].items()),
+        )
+
+def run_maintenance(tiers: Optional[List[RetentionTier]] = None, deadline: Optional[datetime] = None) -> Dict:
+    """Runs a whole maintenance pass in the calling thread and returns its report."""
+    run = MaintenanceRun(tiers, deadline)
+    while run.step():
+        pass
+    return run.report
+
+def compact_products(conn, product_ids: List[int]) -> Tuple[int, int]:
+    """
+    Collapses consecutive history rows with the same price into their first
+    row, extending its last_seen to the end of the run. Runs in the
+    caller's transaction; returns (rows extended, rows deleted).
+    """
+    history = PriceHistoryModel.__table__
+    rows = conn.execute(
+        select(history.c.id, history.c.product_id, history.c.price, history.c.timestamp, history.c.last_seen)
+        .where(history.c.product_id.in_(product_ids))
+        .order_by(history.c.product_id, history.c.timestamp, history.c.id)
+    )
+    extends, deletes = [], []
+    run = None  # [row id, product id, price, stored end of run, new end of run]
+    for row_id, product_id, price, timestamp, last_seen in rows:
+        seen = last_seen or timestamp
+        if run and run[1] == product_id and run[2] == price:
+            deletes.append({"b_id": row_id})
+            run[4] = max(run[4], seen)
+            continue
+        if run and run[4] != run[3]:
+            extends.append({"b_id": run[0], "b_seen": run[4]})
+        run = [row_id, product_id, price, seen, seen]
+    if run and run[4] != run[3]:
+        extends.append({"b_id": run[0], "b_seen": run[4]})
+
+    if extends:
+        conn.execute(
+            update(history).where(history.c.id == bindparam("b_id")).values(last_seen=bindparam("b_seen")),
+            extends,
+        )
+    if deletes:
+        conn.execute(delete(history).where(history.c.id == bindparam("b_id")), deletes)
+    return len(extends), len(deletes)
+
+def compact_history(batch_products: int = COMPACT_BATCH_PRODUCTS, vacuum: bool = True) -> Dict[str, int]:
+    """
+    Converts existing price history to run-length form: consecutive rows
+    with the same price collapse into their first row, whose last_seen is
+    extended to the end of the run. Works through products in batches (one
+    transaction each) and optionally vacuums to return the space.
+    """
+    rows_before = history_row_count()
+    size_before = database_size()
+
+    with engine.connect() as conn:
+        product_ids = [r[0] for r in conn.execute(select(ProductModel.__table__.c.id).order_by(ProductModel.__table__.c.id))]
+
+    for i in range(0, len(product_ids), batch_products):
+        with engine.begin() as conn:
+            compact_products(conn, product_ids[i:i + batch_products])
+
+    if vacuum:
+        vacuum_database()
+
+    rows_after = history_row_count()
+    size_after = database_size()
+    report = {
+        "rows_before": rows_before,
+        "rows_after": rows_after,
+        "bytes_before": size_before["bytes"],
+        "bytes_after": size_after["bytes"],
+        "bytes_saved": size_before["bytes"] - size_after["bytes"],
+    }
+    logger.info(
+        "Compacted price history: %s -> %s rows, %.1f MB saved.",
+        rows_before, rows_after, report['bytes_saved'] / 1024 / 1024,
+    )
+    return report
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    if command == "compact":
+        compact_history()
+    elif command == "maintain":
+        run_maintenance()
+    elif command == "vacuum":
+        before = database_size()
+        vacuum_database()
+        logger.info(
+            "Vacuumed database: %.1f -> %.1f MB.",
+            before["file_bytes"] / 1024 / 1024, database_size()["file_bytes"] / 1024 / 1024,
+        )
+    elif command == "report":
+        report = database_report()
+        logger.info(
+            "Database: %.1f MB (%.1f MB free); rows %s.",
+            report["file_bytes"] / 1024 / 1024, report["free_bytes"] / 1024 / 1024,
+            ", ".join(f"{table} {n}" for table, n in report["rows"].items()),
+        )
+    else:
+        logger.error("Unknown command: %s", command)
@@ -1,55 +1,426 @@
+import csv
+import hashlib
 import json
+import math
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, delete, insert, inspect, or_, select, text, update
 from core.database import Base, engine, SessionLocal
-from core.models import ProductModel, PriceHistoryModel
+from core.models import ImportModel, PriceHistoryModel, PriceRollupModel, ProductModel
+from core.maintenance import COMPACT_BATCH_PRODUCTS, compact_products
+from core.timeseries import update_rollups
+from core.writer import HISTORY_MODE
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
 
 def initialize_database():
+    had_rollups = inspect(engine).has_table("price_rollups")
     Base.metadata.create_all(bind=engine)
+    added = add_missing_columns()
+    add_missing_indexes()
+    if "products.last_price" in added:
+        backfill_latest_prices()
+    if not had_rollups:
+        backfill_rollups()
 
-def migrate_from_json(json_path="data.json"):
-    if not os.path.exists(json_path):
-        print(f"No {json_path} found, skipping migration.")
+def add_missing_columns():
+    """
+    Add columns introduced after a database file was created (create_all
+    skips existing tables). Returns the added "table.column" names.
+    """
+    added = set()
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+                added.add(f"{table.name}.{column.name}")
+                logger.info("Added column %s.%s.", table.name, column.name)
+    return added
+
+def add_missing_indexes():
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def backfill_latest_prices():
+    """Fill products.last_price/last_checked from existing history in one statement."""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE products SET
+                last_price = (
+                    SELECT price FROM price_history h
+                    WHERE h.product_id = products.id
+                    ORDER BY h.timestamp DESC LIMIT 1
+                ),
+                last_checked = (
+                    SELECT MAX(timestamp) FROM price_history h
+                    WHERE h.product_id = products.id
+                )
+        """))
+    logger.info("Backfilled latest prices.")
+
+# SQLite strftime formats matching how SQLAlchemy stores DateTime values
+ROLLUP_BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00.000000",
+    "day": "%Y-%m-%d 00:00:00.000000",
+}
+
+def backfill_rollups():
+    """Build the hourly/daily rollups from existing history."""
+    if engine.dialect.name != "sqlite":
+        _backfill_rollups_portable()
         return
+    with engine.begin() as conn:
+        for resolution, fmt in ROLLUP_BUCKET_FORMATS.items():
+            # SQLite takes bare columns (price) from the row holding MAX(timestamp)
+            conn.execute(text(f"""
+                INSERT OR REPLACE INTO price_rollups (
+                    product_id, resolution, bucket_start, min_price, max_price,
+                    sum_price, count, last_price, last_timestamp
+                )
+                SELECT product_id, '{resolution}', strftime('{fmt}', timestamp),
+                       MIN(price), MAX(price), SUM(price), COUNT(*), price, MAX(timestamp)
+                FROM price_history
+                GROUP BY product_id, strftime('{fmt}', timestamp)
+            """))
+    logger.info("Backfilled price rollups.")
+
+def _backfill_rollups_portable():
+    """backfill_rollups for other backends: streams the history through update_rollups."""
+    history = PriceHistoryModel.__table__
+    with engine.begin() as conn:
+        conn.execute(delete(PriceRollupModel.__table__))
+        result = conn.execution_options(stream_results=True, yield_per=IMPORT_BATCH_SIZE).execute(
+            select(history.c.product_id, history.c.price, history.c.timestamp).where(history.c.price.isnot(None))
+        )
+        for rows in result.mappings().partitions():
+            update_rollups(conn, rows)
+    logger.info("Backfilled price rollups.")
+
+# Streaming import
+IMPORT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 1 << 16
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yields the items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
 
-    with open(json_path, "r", encoding="utf-8") as f:
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise json.JSONDecodeError("Unterminated array", buf, pos)
+            fill()
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise json.JSONDecodeError("Expected a JSON array", buf, pos)
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
         try:
-            data = json.load(f)
+            item, end = decoder.raw_decode(buf, pos)
         except json.JSONDecodeError:
-            print(f"Error decoding {json_path}, skipping migration.")
-            return
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buf) and not eof:
+            # A scalar cut at the chunk boundary would decode short; read on
+            fill()
+            continue
+        pos = end
+        yield item
 
+def iter_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def iter_csv(f):
+    yield from csv.DictReader(f)
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        return datetime.utcfromtimestamp(float(value))
+    if isinstance(value, str) and value:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    return datetime.utcnow()
+
+def file_checksum(path, chunk_size=READ_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _find_previous_import(path):
+    """
+    Returns a matching import marker, or None. Unchanged files (same size and
+    mtime) are recognised from a stat call alone; otherwise the checksum is
+    compared so touched-but-identical files are still skipped.
+    """
+    source = os.path.abspath(path)
+    stat = os.stat(path)
     db = SessionLocal()
     try:
-        for item in data:
-            name = item.get("name")
-            url = item.get("url")
-            selector = item.get("selector")
-            values = item.get("values", [])
-
-            # Create product
-            product = ProductModel(name=name, url=url, selector=selector)
-            db.add(product)
-            db.flush()  # To get product.id
-
-            # Add price history (assuming they were added daily, backwards from now)
-            now = datetime.utcnow()
-            for i, price in enumerate(reversed(values)):
-                history = PriceHistoryModel(
-                    product_id=product.id,
-                    price=float(price),
-                    timestamp=now - timedelta(days=i)
-                )
-                db.add(history)
-        
-        db.commit()
-        print(f"Successfully migrated {len(data)} products from {json_path}.")
-    except Exception as e:
-        db.rollback()
-        print(f"Error during migration: {e}")
+        marker = db.query(ImportModel).filter(
+            ImportModel.source == source,
+            ImportModel.size == stat.st_size,
+            ImportModel.mtime_ns == stat.st_mtime_ns,
+        ).first()
+        if marker:
+            return marker
+        checksum = file_checksum(path)
+        marker = db.query(ImportModel).filter(ImportModel.checksum == checksum).first()
+        if marker:
+            # Remember the new stat so the next startup skips without hashing
+            db.add(ImportModel(
+                source=source, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                checksum=checksum, products=0, prices=0,
+            ))
+            db.commit()
+        return marker
     finally:
         db.close()
 
+def _record_import(conn, path, products, prices):
+    """Writes the import marker in the import's own transaction."""
+    stat = os.stat(path)
+    conn.execute(insert(ImportModel.__table__).values(
+        source=os.path.abspath(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+        checksum=file_checksum(path), products=products, prices=prices,
+    ))
+
+def _parse_price(value):
+    """Float price, or None for values that are not a finite number."""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) else None
+
+class BulkImporter:
+    """
+    Writes price observations in bulk batches with constant memory.
+
+    Observations are (name, url, selector, price, timestamp). Products are
+    matched on (name, url) against the database and created with Core bulk
+    inserts when missing (SQLite assigns their ids). Every batch runs in the
+    caller's connection, so a whole import is one transaction: it either
+    completes, together with its import marker, or leaves nothing behind.
+
+    In "changes" mode (see core.writer) history is stored as runs like
+    scraped prices: repeats within a batch are folded before inserting,
+    and finish() merges runs across batches and with existing history.
+    """
+
+    def __init__(self, conn, batch_size=IMPORT_BATCH_SIZE, mode=HISTORY_MODE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.mode = mode
+        self.products_created = 0
+        self.prices_written = 0
+        self._batch = []
+        self._touched = set()
+
+    def add(self, name, url, selector, price, timestamp):
+        self._batch.append((name, url, selector, float(price), timestamp))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def add_product(self, name, url, selector):
+        """Creates a product without prices, unless it exists."""
+        self._product_ids({(name, url): selector})
+
+    def _lookup(self, urls):
+        products = ProductModel.__table__
+        ids = {}
+        for i in range(0, len(urls), 500):
+            rows = self.conn.execute(
+                select(products.c.id, products.c.name, products.c.url).where(products.c.url.in_(urls[i:i + 500]))
+            )
+            for product_id, name, url in rows:
+                ids.setdefault((name, url), product_id)
+        return ids
+
+    def _product_ids(self, keys):
+        """Ids for (name, url) keys, creating missing products; keys maps each to its selector."""
+        ids = self._lookup(list({url for _, url in keys}))
+        missing = [key for key in keys if key not in ids]
+        if missing:
+            now = datetime.utcnow()
+            self.conn.execute(insert(ProductModel.__table__), [
+                {"name": name, "url": url, "selector": keys[(name, url)], "added_date": now}
+                for name, url in missing
+            ])
+            self.products_created += len(missing)
+            ids.update(self._lookup(list({url for _, url in missing})))
+        return ids
+
+    def flush(self):
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        conn = self.conn
+        ids = self._product_ids({(name, url): selector for name, url, selector, _, _ in batch})
+
+        history = [
+            {"product_id": ids[(name, url)], "price": price, "timestamp": timestamp}
+            for name, url, _, price, timestamp in batch
+        ]
+        conn.execute(insert(PriceHistoryModel.__table__), self._fold(history) if self.mode == "changes" else history)
+        self._touched.update(row["product_id"] for row in history)
+
+        # Latest price per product, only if newer than what is stored
+        latest = {}
+        for row in history:
+            current = latest.get(row["product_id"])
+            if current is None or row["timestamp"] >= current["timestamp"]:
+                latest[row["product_id"]] = row
+        products = ProductModel.__table__
+        conn.execute(
+            update(products)
+            .where(products.c.id == bindparam("b_id"))
+            .where(or_(products.c.last_checked.is_(None), products.c.last_checked <= bindparam("b_timestamp")))
+            .values(last_price=bindparam("b_price"), last_checked=bindparam("b_timestamp")),
+            [{"b_id": r["product_id"], "b_price": r["price"], "b_timestamp": r["timestamp"]} for r in latest.values()],
+        )
+        update_rollups(conn, history)
+        self.prices_written += len(history)
+
+    @staticmethod
+    def _fold(history):
+        """Consecutive observations of the same price per product as one row spanning them."""
+        rows = []
+        for row in sorted(history, key=lambda r: (r["product_id"], r["timestamp"])):
+            run = rows[-1] if rows else None
+            if run and run["product_id"] == row["product_id"] and run["price"] == row["price"]:
+                run["last_seen"] = row["timestamp"]
+            else:
+                rows.append({**row, "last_seen": None})
+        return rows
+
+    def finish(self):
+        """Writes the last batch and, in "changes" mode, merges runs of the imported products."""
+        self.flush()
+        if self.mode == "changes":
+            touched = sorted(self._touched)
+            for i in range(0, len(touched), COMPACT_BATCH_PRODUCTS):
+                compact_products(self.conn, touched[i:i + COMPACT_BATCH_PRODUCTS])
+
+def migrate_from_json(json_path="data.json", batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports the legacy data.json (a list of products with a "values" price
+    list, assumed daily and ending today). The file is streamed and written
+    in bulk batches within one transaction; once imported it is skipped on
+    later startups. Values that are not numbers are skipped.
+    """
+    if not os.path.exists(json_path):
+        logger.info("No %s found, skipping migration.", json_path)
+        return
+
+    if _find_previous_import(json_path):
+        logger.info("%s already imported, skipping migration.", json_path)
+        return
+
+    count = 0
+    skipped = 0
+    try:
+        with engine.begin() as conn, open(json_path, "r", encoding="utf-8") as f:
+            importer = BulkImporter(conn, batch_size)
+            now = datetime.utcnow()
+            for item in iter_json_array(f):
+                added = 0
+                # Price history (assuming they were added daily, backwards from now)
+                for i, value in enumerate(reversed(item.get("values", []))):
+                    price = _parse_price(value)
+                    if price is None:
+                        skipped += 1
+                        continue
+                    importer.add(item.get("name"), item.get("url"), item.get("selector"), price, now - timedelta(days=i))
+                    added += 1
+                if not added:
+                    # Products without history still need to be created
+                    importer.add_product(item.get("name"), item.get("url"), item.get("selector"))
+                count += 1
+            importer.finish()
+            _record_import(conn, json_path, count, importer.prices_written)
+        logger.info("Successfully migrated %s products from %s, skipped %s invalid prices.", count, json_path, skipped)
+    except json.JSONDecodeError:
+        logger.error("Error decoding %s, nothing imported.", json_path)
+    except Exception as e:
+        logger.error("Error during migration, nothing imported: %s", e)
+
+def import_price_dump(path, fmt=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports a CSV or JSONL price dump from another tracker. Each row is one
+    observation with name, url, price, timestamp (ISO 8601 or epoch seconds)
+    and an optional selector. Products are matched on (name, url). The
+    whole file is imported in one transaction.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    readers = {"csv": iter_csv, "jsonl": iter_jsonl, "ndjson": iter_jsonl}
+    if fmt not in readers:
+        logger.error("Unsupported dump format: %s", fmt)
+        return
+    if _find_previous_import(path):
+        logger.info("%s already imported, skipping.", path)
+        return
+
+    skipped = 0
+    try:
+        with engine.begin() as conn, open(path, "r", encoding="utf-8", newline="") as f:
+            importer = BulkImporter(conn, batch_size)
+            for row in readers[fmt](f):
+                price = _parse_price(row.get("price"))
+                try:
+                    timestamp = _parse_timestamp(row.get("timestamp"))
+                except (TypeError, ValueError):
+                    price = None
+                if price is None:
+                    skipped += 1
+                    continue
+                importer.add(row.get("name") or row.get("url"), row.get("url"), row.get("selector") or None, price, timestamp)
+            importer.finish()
+            _record_import(conn, path, importer.products_created, importer.prices_written)
+        logger.info(
+            "Imported %s prices (%s new products) from %s, skipped %s invalid rows.",
+            importer.prices_written, importer.products_created, path, skipped,
+        )
+    except Exception as e:
+        logger.error("Error importing %s, nothing imported: %s", path, e)
+
 if __name__ == "__main__":
     initialize_database()
-    migrate_from_json()
+    if len(sys.argv) > 1:
+        for dump_path in sys.argv[1:]:
+            import_price_dump(dump_path)
+    else:
+        migrate_from_json()
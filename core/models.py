@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from core.database import Base
 
@@ -10,8 +10,21 @@ class ProductModel(Base):
     name = Column(String, index=True)
     url = Column(String)
     selector = Column(String, nullable=True)
+    learned_selector = Column(String, nullable=True)
     added_date = Column(DateTime, default=datetime.utcnow)
 
+    # Denormalized latest price, maintained whenever history is recorded
+    last_price = Column(Float, nullable=True)
+    last_checked = Column(DateTime, nullable=True)
+    # Notify when the price falls to this value
+    target_price = Column(Float, nullable=True)
+
+    # Adaptive polling: user priority (see core.polling.PRIORITY_FACTORS),
+    # when the product is due next and consecutive failed checks
+    priority = Column(Integer, nullable=True)
+    next_check = Column(DateTime, nullable=True, index=True)
+    error_count = Column(Integer, nullable=True)
+
     price_history = relationship("PriceHistoryModel", back_populates="product", cascade="all, delete-orphan")
 
     def __repr__(self):
@@ -19,13 +32,95 @@ class ProductModel(Base):
 
 class PriceHistoryModel(Base):
     __tablename__ = "price_history"
+    __table_args__ = (
+        Index("ix_price_history_product_timestamp", "product_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     price = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow)  # first seen at this price
+    last_seen = Column(DateTime, nullable=True)  # end of a run of identical prices
 
     product = relationship("ProductModel", back_populates="price_history")
 
     def __repr__(self):
         return f"<PriceHistory(product_id={self.product_id}, price={self.price}, timestamp={self.timestamp})>"
+
+class PriceRollupModel(Base):
+    __tablename__ = "price_rollups"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    resolution = Column(String, primary_key=True)  # "hour" or "day"
+    bucket_start = Column(DateTime, primary_key=True)
+    min_price = Column(Float)
+    max_price = Column(Float)
+    sum_price = Column(Float)
+    count = Column(Integer)
+    last_price = Column(Float)
+    last_timestamp = Column(DateTime)
+
+    @property
+    def avg_price(self):
+        return self.sum_price / self.count if self.count else None
+
+    def __repr__(self):
+        return f"<PriceRollup(product_id={self.product_id}, {self.resolution}={self.bucket_start}, min={self.min_price}, max={self.max_price})>"
+
+class DomainSelectorModel(Base):
+    __tablename__ = "domain_selectors"
+
+    domain = Column(String, primary_key=True)
+    selector = Column(String, primary_key=True)
+    hits = Column(Integer, default=0)
+    misses = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DomainSelector(domain='{self.domain}', selector='{self.selector}', hits={self.hits})>"
+
+class PageCacheModel(Base):
+    __tablename__ = "page_cache"
+
+    key = Column(String, primary_key=True)
+    url = Column(String)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    body_hash = Column(String, nullable=True)
+    text = Column(String, nullable=True)
+    price = Column(Float, nullable=True)
+    last_used = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<PageCache(url='{self.url}', etag={self.etag}, price={self.price})>"
+
+class ImportModel(Base):
+    __tablename__ = "imports"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String, index=True)
+    size = Column(Integer)
+    mtime_ns = Column(Integer)
+    checksum = Column(String, index=True)
+    products = Column(Integer, default=0)
+    prices = Column(Integer, default=0)
+    imported_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Import(source='{self.source}', products={self.products}, prices={self.prices})>"
+
+class ScrapeJobModel(Base):
+    """A product queued for scraping by worker processes (see core.jobs)."""
+    __tablename__ = "scrape_jobs"
+
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), unique=True)
+    enqueued_at = Column(DateTime, default=datetime.utcnow)
+    # Set while a worker holds the job; an expired lease makes it claimable again
+    lease_token = Column(String, nullable=True, index=True)
+    lease_owner = Column(String, nullable=True)
+    lease_expires = Column(DateTime, nullable=True, index=True)
+    attempts = Column(Integer, default=0)
+
+    def __repr__(self):
+        return f"<ScrapeJob(product_id={self.product_id}, owner={self.lease_owner}, expires={self.lease_expires})>"
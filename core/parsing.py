@@ -0,0 +1,197 @@
+import asyncio
+import os
+import re
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from utils.helpers import child_log_queue, init_child_logging, setup_logger
+
+logger = setup_logger(__name__)
+
+# Default number of parse workers
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Selectors from legacy Tracker.py
+TRENDYOL_SELECTORS = [
+    "span.prc-dsc",
+    "span.prc-slg",
+    "span.prc-org",
+]
+
+COMMON_PRICE_SELECTORS = [
+    "span.price",
+    "span.current-price",
+    "[data-test='price']",
+    ".price .amount",
+    "meta[itemprop='price']",
+]
+
+def parse_price(text: str) -> Optional[float]:
+    """
+    Robust price parsing for various international formats.
+    
+    Examples:
+    - 1,234.56 -> 1234.56
+    - 1.234,56 -> 1234.56
+    - 1 234,56 -> 1234.56
+    - $12.34 -> 12.34
+    """
+    if not text:
+        return None
+        
+    # Remove symbols like currency and spaces
+    cleaned = re.sub(r"[^\d.,]", "", text)
+    if not cleaned:
+        return None
+        
+    # Handle cases with multiple commas/dots
+    # If both , and . are present, assume the last one is the decimal separator
+    if "," in cleaned and "." in cleaned:
+        if cleaned.rfind(",") > cleaned.rfind("."):
+            # 1.234,56 -> 1234.56
+            cleaned = cleaned.replace(".", "").replace(",", ".")
+        else:
+            # 1,234.56 -> 1234.56
+            cleaned = cleaned.replace(",", "")
+    elif "," in cleaned:
+        # 1234,56 -> 1234.56
+        # But wait, what if it's 1,234 (thousands)?
+        # For simplicity, if only one comma exists, we can't be sure, 
+        # but in many regions it's the decimal separator.
+        # Let's count them. If more than one comma, it's a thousand separator.
+        if cleaned.count(",") > 1:
+            cleaned = cleaned.replace(",", "")
+        else:
+            # 12,34 -> 12.34
+            cleaned = cleaned.replace(",", ".")
+            
+    try:
+        return float(cleaned)
+    except ValueError:
+        logger.error("Failed to parse price from: %s", text)
+        return None
+
+def build_selector_chain(url: str, selector: Optional[str] = None) -> List[str]:
+    """
+    Returns the ordered selectors tried for a product: the user-provided
+    selector, then domain-specific ones, then the common fallbacks.
+    """
+    chain = []
+    if selector:
+        chain.append(selector)
+    if "trendyol.com" in urlparse(url).netloc:
+        chain.extend(TRENDYOL_SELECTORS)
+    chain.extend(COMMON_PRICE_SELECTORS)
+    return chain
+
+def extract_price(body: bytes, selectors: List[str], encoding: Optional[str] = None) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+    """
+    Extracts the price from a raw HTML document, trying selectors in order.
+    Returns (text, price, winning selector).
+
+    Runs inside parse workers, so it only takes and returns picklable data.
+    """
+    return extract_prices(body, [selectors], encoding)[0]
+
+def extract_prices(
+    body: bytes, chains: List[List[str]], encoding: Optional[str] = None
+) -> List[Tuple[Optional[str], Optional[float], Optional[str]]]:
+    """extract_price for several selector chains over a single parse of the document."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body, "lxml", from_encoding=encoding)
+    found: Dict[str, Tuple[Optional[str], Optional[float]]] = {}
+    results = []
+    for selectors in chains:
+        result = (None, None, None)
+        for sel in selectors:
+            if sel not in found:
+                el = soup.select_one(sel)
+                # meta tags carry the price in their content attribute
+                text = (el.get_text(strip=True) or el.get("content", "").strip()) if el else None
+                found[sel] = (text, parse_price(text) if text else None)
+            text, price = found[sel]
+            if price is not None:
+                result = (text, price, sel)
+                break
+        results.append(result)
+    return results
+
+class ParseWorkerPool:
+    """
+    Runs HTML extraction off the event loop.
+
+    Uses a process pool so parsing scales across cores; falls back to a
+    thread pool where processes are unavailable or the pool breaks.
+    Streaming parses (StreamExtractor) run on one dedicated thread instead:
+    an lxml parser must stay on the thread that created it.
+    """
+
+    def __init__(self, max_workers: int = PARSE_WORKERS, use_processes: bool = True):
+        self.max_workers = max(1, max_workers)
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._stream_executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                try:
+                    # spawn: forking a process that runs Qt and threads is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=init_child_logging,
+                        initargs=(child_log_queue(),),
+                    )
+                    logger.info("Started process parse pool with %s workers.", self.max_workers)
+                except (OSError, NotImplementedError, ValueError) as e:
+                    logger.warning("Process pool unavailable (%s), using threads for parsing.", e)
+                    self.use_processes = False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="parse")
+                logger.info("Started thread parse pool with %s workers.", self.max_workers)
+        return self._executor
+
+    async def extract(self, body: bytes, selectors: List[str], encoding: Optional[str] = None) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+        return (await self.extract_many(body, [selectors], encoding))[0]
+
+    async def extract_many(
+        self, body: bytes, chains: List[List[str]], encoding: Optional[str] = None
+    ) -> List[Tuple[Optional[str], Optional[float], Optional[str]]]:
+        """Results per selector chain, from one parse of the body."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), extract_prices, body, chains, encoding)
+        except BrokenProcessPool:
+            logger.warning("Process parse pool broke, falling back to threads.")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.use_processes = False
+            return await loop.run_in_executor(self._get_executor(), extract_prices, body, chains, encoding)
+
+    async def run_streaming(self, fn, *args):
+        """Runs fn on the streaming parse thread, e.g. creating or feeding a StreamExtractor."""
+        if self._stream_executor is None:
+            self._stream_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-parse")
+        return await asyncio.get_running_loop().run_in_executor(self._stream_executor, fn, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._stream_executor is not None:
+            self._stream_executor.shutdown(wait=False, cancel_futures=True)
+            self._stream_executor = None
+
+_default_pool: Optional[ParseWorkerPool] = None
+
+def default_parse_pool() -> ParseWorkerPool:
+    """Parse pool shared by every ScraperSession that does not bring its own."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ParseWorkerPool()
+    return _default_pool
@@ -0,0 +1,120 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from core.scraper import PriceRequest, ScraperSession, fetch_prices, normalize_url
+from utils.helpers import setup_logger
+from utils.metrics import domain_of, metrics
+
+logger = setup_logger(__name__)
+
+# Concurrency caps
+MAX_CONCURRENCY = 20
+MAX_PER_DOMAIN = 4
+
+class ScrapeJob(NamedTuple):
+    product_id: int
+    url: str
+    selector: Optional[str] = None
+
+class ScrapeResult(NamedTuple):
+    product_id: int
+    url: str
+    text: Optional[str]
+    price: Optional[float]
+
+class _DomainQueue:
+    """
+    Pending pages grouped by domain, handed out round-robin so that one
+    busy host never starves the others of workers. Jobs for the same page
+    (by normalized URL) form one group and are fetched together.
+    """
+
+    def __init__(self, jobs: Iterable[ScrapeJob], per_domain: int):
+        self.per_domain = per_domain
+        self.pending: Dict[str, Deque[List[ScrapeJob]]] = {}
+        self.active: Dict[str, int] = {}
+        self.order: Deque[str] = deque()
+        self.remaining = 0
+        self.jobs = 0
+        self.changed = asyncio.Event()
+        groups: Dict[str, List[ScrapeJob]] = {}
+        for job in jobs:
+            self.jobs += 1
+            key = normalize_url(job.url)
+            if key in groups:
+                groups[key].append(job)
+                continue
+            groups[key] = [job]
+            domain = urlparse(job.url).netloc.lower()
+            if domain not in self.pending:
+                self.pending[domain] = deque()
+                self.active[domain] = 0
+                self.order.append(domain)
+            self.pending[domain].append(groups[key])
+            self.remaining += 1
+
+    def take(self) -> Optional[List[ScrapeJob]]:
+        for _ in range(len(self.order)):
+            domain = self.order[0]
+            self.order.rotate(-1)
+            if self.pending[domain] and self.active[domain] < self.per_domain:
+                self.active[domain] += 1
+                self.remaining -= 1
+                return self.pending[domain].popleft()
+        return None
+
+    def release(self, group: List[ScrapeJob]):
+        self.active[urlparse(group[0].url).netloc.lower()] -= 1
+        self.changed.set()
+
+async def scrape_stream(
+    jobs: Iterable[ScrapeJob],
+    session: ScraperSession,
+    max_concurrency: int = MAX_CONCURRENCY,
+    max_per_domain: int = MAX_PER_DOMAIN,
+) -> AsyncIterator[ScrapeResult]:
+    """
+    Scrapes jobs with a global and a per-domain concurrency cap,
+    yielding each result as soon as it finishes. The caps count pages:
+    jobs sharing a URL take one slot and one request.
+    """
+    queue = _DomainQueue(jobs, max_per_domain)
+    total = queue.jobs
+    if total == 0:
+        return
+
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while True:
+            group = queue.take()
+            if group is None:
+                if queue.remaining == 0:
+                    return
+                # Every pending domain is at its cap, wait for a slot
+                queue.changed.clear()
+                await queue.changed.wait()
+                continue
+            url = group[0].url
+            if len(group) > 1:
+                metrics.incr("coalesced", domain_of(url), "same_url", len(group) - 1)
+            try:
+                prices = await fetch_prices(url, [PriceRequest(job.product_id, job.selector) for job in group], session)
+            except Exception as e:
+                logger.error("Unexpected error scraping %s: %s", url, e)
+                prices = [(None, None)] * len(group)
+            finally:
+                queue.release(group)
+            for job, (text, price) in zip(group, prices):
+                await results.put(ScrapeResult(job.product_id, job.url, text, price))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(max_concurrency, queue.remaining))]
+    try:
+        for _ in range(total):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, or_, update
+
+from core.models import PriceHistoryModel, ProductModel
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+# Bounds for a single product's check interval
+MIN_INTERVAL_HOURS = 0.25
+MAX_INTERVAL_HOURS = 24.0
+
+# A product that never changes is checked STABLE_FACTOR times less often
+# than the base interval; every expected price change per day adds
+# CHECKS_PER_CHANGE checks on top of that.
+STABLE_FACTOR = 4.0
+CHECKS_PER_CHANGE = 4.0
+VOLATILITY_WINDOW_DAYS = 30
+
+# Check interval multipliers by user priority
+PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH = 0, 1, 2
+PRIORITY_FACTORS = {PRIORITY_LOW: 2.0, PRIORITY_NORMAL: 1.0, PRIORITY_HIGH: 0.5}
+
+# Failed checks double the interval, up to 2 ** MAX_ERROR_BACKOFF
+MAX_ERROR_BACKOFF = 6
+
+# Random spread applied to every next check (fraction of the interval)
+JITTER = 0.1
+
+# Global budget shared by all due products, and how often the queue is polled
+REQUESTS_PER_MINUTE = 120
+TICK_SECONDS = 30
+
+def next_interval(
+    base_hours: float,
+    changes_per_day: float = 0.0,
+    priority: Optional[int] = None,
+    error_count: Optional[int] = None,
+) -> float:
+    """
+    Hours until a product's next check: the check rate is a baseline for
+    stable products plus CHECKS_PER_CHANGE checks per expected price change,
+    scaled by priority and backed off exponentially after failures.
+    """
+    stable = base_hours * STABLE_FACTOR
+    hours = 1.0 / (1.0 / stable + changes_per_day * CHECKS_PER_CHANGE / 24.0)
+    hours *= PRIORITY_FACTORS.get(PRIORITY_NORMAL if priority is None else priority, 1.0)
+    if error_count:
+        hours *= 2 ** min(error_count, MAX_ERROR_BACKOFF)
+    return min(MAX_INTERVAL_HOURS, max(MIN_INTERVAL_HOURS, hours))
+
+def next_check_time(
+    now: datetime,
+    base_hours: float,
+    changes_per_day: float = 0.0,
+    priority: Optional[int] = None,
+    error_count: Optional[int] = None,
+) -> datetime:
+    hours = next_interval(base_hours, changes_per_day, priority, error_count)
+    return now + timedelta(hours=hours * random.uniform(1 - JITTER, 1 + JITTER))
+
+def change_rates(db, product_ids: Optional[Iterable[int]], now: datetime) -> Dict[int, float]:
+    """
+    Price changes per day over the volatility window, for the given products
+    (or all of them). With run-length history every row in the window is a
+    price change, except a product's very first row.
+    """
+    history = PriceHistoryModel
+    query = db.query(history.product_id, func.count()).filter(
+        history.timestamp >= now - timedelta(days=VOLATILITY_WINDOW_DAYS)
+    )
+    if product_ids is not None:
+        query = query.filter(history.product_id.in_(list(product_ids)))
+    rows = query.group_by(history.product_id).all()
+    return {product_id: max(0, n - 1) / VOLATILITY_WINDOW_DAYS for product_id, n in rows}
+
+def due_products(db, now: datetime, limit: int) -> Tuple[List, Dict[int, float]]:
+    """
+    Up to limit products whose next check is due, most overdue first (new,
+    never scheduled products before anything else), with their change rates.
+    """
+    rows = db.query(
+        ProductModel.id,
+        ProductModel.name,
+        ProductModel.url,
+        ProductModel.selector,
+        ProductModel.last_price,
+        ProductModel.last_checked,
+        ProductModel.priority,
+        ProductModel.error_count,
+        ProductModel.target_price,
+    ).filter(
+        or_(ProductModel.next_check.is_(None), ProductModel.next_check <= now)
+    ).order_by(
+        ProductModel.next_check.asc().nulls_first(), ProductModel.priority.desc()
+    ).limit(limit).all()
+    rates = change_rates(db, [r.id for r in rows], now) if rows else {}
+    return rows, rates
+
+def spread_unscheduled(db, base_hours: float, now: Optional[datetime] = None) -> int:
+    """
+    Gives every product without a next check a random one within the base
+    interval, so a fresh (or just upgraded) database does not check all
+    products in the first minutes. Returns the number of products scheduled.
+    """
+    now = now or datetime.utcnow()
+    ids = [r.id for r in db.query(ProductModel.id).filter(ProductModel.next_check.is_(None))]
+    if not ids:
+        return 0
+    seconds = base_hours * 3600
+    products = ProductModel.__table__
+    db.execute(
+        update(products).where(products.c.id == bindparam("b_id")).values(next_check=bindparam("b_next")),
+        [{"b_id": i, "b_next": now + timedelta(seconds=random.uniform(0, seconds))} for i in ids],
+    )
+    logger.info("Spread %s unscheduled products over %sh.", len(ids), base_hours)
+    return len(ids)
@@ -0,0 +1,108 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from core.database import SessionLocal
+from core.models import ProductModel
+from core.timeseries import DEFAULT_MAX_POINTS, Series, get_series
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+def list_products_with_latest(db) -> List:
+    """
+    Returns every product with its latest price in a single query, as rows
+    of (id, name, url, selector, last_price, last_checked, priority,
+    error_count, target_price).
+    """
+    return db.query(
+        ProductModel.id,
+        ProductModel.name,
+        ProductModel.url,
+        ProductModel.selector,
+        ProductModel.last_price,
+        ProductModel.last_checked,
+        ProductModel.priority,
+        ProductModel.error_count,
+        ProductModel.target_price,
+    ).order_by(ProductModel.id).all()
+
+def add_product(
+    db,
+    name: str,
+    url: str,
+    selector: Optional[str] = None,
+    priority: Optional[int] = None,
+    target_price: Optional[float] = None,
+) -> Tuple[int, str]:
+    product = ProductModel(name=name, url=url, selector=selector, priority=priority, target_price=target_price)
+    db.add(product)
+    db.flush()
+    return product.id, product.name
+
+class AsyncRepository:
+    """
+    Runs all database work on one dedicated thread and hands results back
+    as awaitables, so neither the Qt GUI nor the scraping coroutines on the
+    shared event loop ever block on SQLite.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Runs fn(db, *args) in its own session on the DB thread and commits."""
+        return await self.call(self._in_session, fn, *args)
+
+    async def call(self, fn: Callable, *args) -> Any:
+        """Runs fn(*args) on the DB thread, for code that manages its own connections."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    @staticmethod
+    def _in_session(fn: Callable, *args) -> Any:
+        db = SessionLocal()
+        try:
+            result = fn(db, *args)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def list_products(self) -> List:
+        return await self.run(list_products_with_latest)
+
+    async def add_product(
+        self,
+        name: str,
+        url: str,
+        selector: Optional[str] = None,
+        priority: Optional[int] = None,
+        target_price: Optional[float] = None,
+    ) -> Tuple[int, str]:
+        return await self.run(add_product, name, url, selector, priority, target_price)
+
+    async def get_series(
+        self,
+        product_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        max_points: int = DEFAULT_MAX_POINTS,
+    ) -> Series:
+        return await self.run(get_series, product_id, start, end, max_points)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+_repository: Optional[AsyncRepository] = None
+
+def get_repository() -> AsyncRepository:
+    """Repository shared by the UI, the scheduler and startup migration."""
+    global _repository
+    if _repository is None:
+        _repository = AsyncRepository()
+    return _repository
@@ -1,13 +1,26 @@
 import asyncio
-import re
+import hashlib
 import logging
-from typing import Optional, Tuple, List
-from urllib.parse import urlparse
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import httpx
-from bs4 import BeautifulSoup
 
+from core.cache import ValidatorCache
+from core.extraction import StreamExtractor, compile_chain
+from core.parsing import (
+    COMMON_PRICE_SELECTORS,
+    TRENDYOL_SELECTORS,
+    ParseWorkerPool,
+    build_selector_chain,
+    default_parse_pool,
+    parse_price,
+)
+from core.selectors import SelectorMemo
+from core.throttle import RETRY_STATUSES, HostThrottle, parse_retry_after
 from utils.helpers import setup_logger
+from utils.metrics import domain_of, metrics
 
 logger = setup_logger(__name__)
 
@@ -22,129 +35,390 @@ DEFAULT_HEADERS = {
     "Accept-Language": "en-US,en;q=0.9,tr;q=0.8",
 }
 
-# Selectors from legacy Tracker.py
-TRENDYOL_SELECTORS = [
-    "span.prc-dsc",
-    "span.prc-slg",
-    "span.prc-org",
-]
-
-COMMON_PRICE_SELECTORS = [
-    "span.price",
-    "span.current-price",
-    "[data-test='price']",
-    ".price .amount",
-    "meta[itemprop='price']",
-]
-
-def parse_price(text: str) -> Optional[float]:
+# Connection pool
+POOL_MAX_CONNECTIONS = 100
+POOL_MAX_KEEPALIVE = 20
+KEEPALIVE_EXPIRY = 30.0
+
+# Streaming extraction
+STREAM_CHUNK_SIZE = 16384
+
+def _supported_encodings() -> str:
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        pass
+    return ", ".join(encodings)
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def normalize_url(url: str) -> str:
     """
-    Robust price parsing for various international formats.
-    
-    Examples:
-    - 1,234.56 -> 1234.56
-    - 1.234,56 -> 1234.56
-    - 1 234,56 -> 1234.56
-    - $12.34 -> 12.34
+    Key for requests that fetch the same page: scheme and host lower-cased,
+    default port and fragment dropped, query parameters sorted.
     """
-    if not text:
-        return None
-        
-    # Remove symbols like currency and spaces
-    cleaned = re.sub(r"[^\d.,]", "", text)
-    if not cleaned:
-        return None
-        
-    # Handle cases with multiple commas/dots
-    # If both , and . are present, assume the last one is the decimal separator
-    if "," in cleaned and "." in cleaned:
-        if cleaned.rfind(",") > cleaned.rfind("."):
-            # 1.234,56 -> 1234.56
-            cleaned = cleaned.replace(".", "").replace(",", ".")
-        else:
-            # 1,234.56 -> 1234.56
-            cleaned = cleaned.replace(",", "")
-    elif "," in cleaned:
-        # 1234,56 -> 1234.56
-        # But wait, what if it's 1,234 (thousands)?
-        # For simplicity, if only one comma exists, we can't be sure, 
-        # but in many regions it's the decimal separator.
-        # Let's count them. If more than one comma, it's a thousand separator.
-        if cleaned.count(",") > 1:
-            cleaned = cleaned.replace(",", "")
-        else:
-            # 12,34 -> 12.34
-            cleaned = cleaned.replace(",", ".")
-            
     try:
-        return float(cleaned)
+        parts = urlsplit(url.strip())
+        port = parts.port
     except ValueError:
-        logger.error(f"Failed to parse price from: {text}")
-        return None
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname or ""
+    if port is not None and (scheme, port) not in (("http", 80), ("https", 443)):
+        netloc = f"{netloc}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+class _Flight(NamedTuple):
+    chains: Set[Tuple[str, ...]]
+    task: "asyncio.Task"
+
+class ScraperSession:
+    """
+    Long-lived HTTP session shared by all fetches of a component.
+
+    Keeps a pooled httpx.AsyncClient so requests to the same host reuse
+    keep-alive connections instead of paying a new TCP+TLS handshake.
+    """
 
-async def fetch_price(url: str, selector: Optional[str] = None) -> Tuple[Optional[str], Optional[float]]:
+    def __init__(
+        self,
+        max_connections: int = POOL_MAX_CONNECTIONS,
+        max_keepalive: int = POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        http2: bool = True,
+        timeout: float = REQUEST_TIMEOUT,
+        cache: Optional[ValidatorCache] = None,
+        parse_pool: Optional[ParseWorkerPool] = None,
+        streaming: bool = True,
+        memo: Optional[SelectorMemo] = None,
+        throttle: Optional[HostThrottle] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+        self.http2 = http2 and _http2_available()
+        self.timeout = timeout
+        self.cache = cache
+        self.parse_pool = parse_pool or default_parse_pool()
+        self.streaming = streaming
+        self.memo = memo
+        self.throttle = throttle or HostThrottle()
+        self._client: Optional[httpx.AsyncClient] = None
+        # Page fetches in progress, by normalized URL
+        self._in_flight: Dict[str, _Flight] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = dict(DEFAULT_HEADERS)
+            headers["Accept-Encoding"] = _supported_encodings()
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+        return self._client
+
+    def shared_fetch(self, url: str, pairs: List[Tuple[Optional[str], Tuple[str, ...]]], domain: str) -> "asyncio.Task":
+        """
+        Task fetching the page for the given (selector, chain) pairs: the one
+        already in flight for this URL if it evaluates every chain, else a new
+        one, which later callers can join while it runs.
+        """
+        key = normalize_url(url)
+        flight = self._in_flight.get(key)
+        chains = {chain for _, chain in pairs}
+        if flight is not None and chains <= flight.chains:
+            metrics.incr("coalesced", domain, "in_flight")
+            return flight.task
+        task = asyncio.ensure_future(_fetch_with_retries(url, pairs, self, domain))
+        if flight is None:
+            self._in_flight[key] = _Flight(chains, task)
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return task
+
+    def load_state(self):
+        """Load the validator cache and learned selectors up front."""
+        if self.cache is not None:
+            self.cache.load()
+        if self.memo is not None:
+            self.memo.load()
+
+    def save_state(self):
+        """Persist the validator cache and learned selectors."""
+        if self.cache is not None:
+            self.cache.save()
+        if self.memo is not None:
+            self.memo.save()
+
+    async def close(self):
+        for flight in list(self._in_flight.values()):
+            flight.task.cancel()
+        self.save_state()
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def __aenter__(self) -> "ScraperSession":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+class PriceRequest(NamedTuple):
+    product_id: Optional[int]
+    selector: Optional[str] = None
+
+# (text, price, winning selector) per selector chain, and whether it came from the validator cache
+PageResult = Tuple[Dict[Tuple[str, ...], Tuple[Optional[str], Optional[float], Optional[str]]], bool]
+
+async def fetch_price(
+    url: str,
+    selector: Optional[str] = None,
+    session: Optional[ScraperSession] = None,
+    product_id: Optional[int] = None,
+) -> Tuple[Optional[str], Optional[float]]:
     """
     Fetches the price from the given URL using optional CSS selector.
+
+    Pass a shared ScraperSession to reuse pooled connections; without one
+    a temporary session is opened for this single request. If the session
+    has a validator cache, unchanged pages (304, or an identical body when
+    the whole document is downloaded) return the last extracted price
+    without parsing.
+
+    When every selector in the chain is supported by the streaming engine,
+    the page is parsed as it arrives (on the parse pool's streaming thread)
+    and the download stops at the price. Such pages are never downloaded
+    whole, so only a 304 skips their parsing; the identical-body check
+    applies to the pooled path.
+    With a product_id and a session selector memo, the selector that worked
+    last time is tried first.
+
+    Requests go through the session's HostThrottle: they are paced per host,
+    connection errors and 429/5xx responses are retried with backoff (or
+    after Retry-After), and hosts that keep failing are skipped for a while.
+    """
+    return (await fetch_prices(url, [PriceRequest(product_id, selector)], session))[0]
+
+async def fetch_prices(
+    url: str,
+    requests: Sequence[PriceRequest],
+    session: Optional[ScraperSession] = None,
+) -> List[Tuple[Optional[str], Optional[float]]]:
+    """
+    fetch_price for several products tracking the same page: the page is
+    fetched and parsed once and every request's selector chain is evaluated
+    against that parse. Results keep input order.
+
+    Concurrent calls for the same page (by normalized URL) share one
+    in-flight request when it already covers their selectors.
     """
-    async with httpx.AsyncClient(headers=DEFAULT_HEADERS, follow_redirects=True, timeout=REQUEST_TIMEOUT) as client:
+    if session is None:
+        async with ScraperSession() as temp_session:
+            return await fetch_prices(url, requests, temp_session)
+
+    domain = domain_of(url)
+    memo = session.memo
+    chains = []
+    for request in requests:
+        chain = build_selector_chain(url, request.selector)
+        if memo and request.product_id is not None:
+            chain = memo.order(request.product_id, url, chain, request.selector)
+        chains.append(tuple(chain))
+    # One chain per distinct selector order, with the selector its cache entry is stored under
+    pairs = list({chain: (request.selector, chain) for request, chain in zip(requests, chains)}.values())
+
+    page = await asyncio.shield(session.shared_fetch(url, pairs, domain))
+    if page is None:
+        return [(None, None)] * len(requests)
+    results, cached = page
+
+    prices = []
+    for request, chain in zip(requests, chains):
+        text, price, winner = results[chain]
+        if not cached:
+            metrics.observe("selector_attempts", domain, chain.index(winner) + 1 if winner in chain else len(chain))
+            if memo and request.product_id is not None:
+                memo.record(request.product_id, url, list(chain), winner)
+            if price is None:
+                metrics.incr("errors", domain, "no_price")
+                logger.warning("No price found for %s", url)
+        prices.append((text, price) if price is not None else (None, None))
+    return prices
+
+async def _fetch_with_retries(
+    url: str,
+    pairs: List[Tuple[Optional[str], Tuple[str, ...]]],
+    session: ScraperSession,
+    domain: str,
+) -> Optional[PageResult]:
+    """_fetch_once under the session's HostThrottle; None if the page could not be fetched."""
+    throttle = session.throttle
+    attempt = 0
+    while True:
+        wait = throttle.reserve(domain)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # Checked after the wait: the circuit may have opened in the meantime
+        if not throttle.allow(domain):
+            logger.info("Skipping %s: %s is cooling off after repeated failures.", url, domain)
+            return None
         try:
-            logger.info(f"Fetching: {url}")
-            response = await client.get(url)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, "lxml")
-            
-            # 1) Try user-provided selector
-            if selector:
-                el = soup.select_one(selector)
-                if el:
-                    text = el.get_text(strip=True)
-                    price = parse_price(text)
-                    if price is not None:
-                        return text, price
-            
-            # 2) Domain-specific logic
-            domain = urlparse(url).netloc
-            if "trendyol.com" in domain:
-                for sel in TRENDYOL_SELECTORS:
-                    el = soup.select_one(sel)
-                    if el:
-                        text = el.get_text(strip=True)
-                        price = parse_price(text)
-                        if price is not None:
-                            return text, price
-                            
-            # 3) Common selectors
-            for sel in COMMON_PRICE_SELECTORS:
-                el = soup.select_one(sel)
-                if el:
-                    text = el.get_text(strip=True)
-                    price = parse_price(text)
-                    if price is not None:
-                        return text, price
-                        
-            logger.warning(f"No price found for {url}")
-            return None, None
-            
+            page = await _fetch_once(url, pairs, session, domain)
         except httpx.HTTPError as e:
-            logger.error(f"HTTP Error fetching {url}: {e}")
-            return None, None
+            metrics.incr("errors", domain, type(e).__name__)
+            response = e.response if isinstance(e, httpx.HTTPStatusError) else None
+            if response is not None:
+                transient = response.status_code in RETRY_STATUSES
+            else:
+                transient = isinstance(e, httpx.TransportError)
+            if not transient:
+                # The host is up, the page is not (404, redirect loops and the like)
+                throttle.success(domain)
+                logger.error("HTTP Error fetching %s: %s", url, e)
+                return None
+            attempt += 1
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+            delay = throttle.retry_delay(domain, attempt, retry_after) if throttle.failure(domain) else None
+            if delay is None:
+                logger.error("HTTP Error fetching %s: %s", url, e)
+                return None
+            logger.warning("Retrying %s in %.1fs (attempt %s): %s", url, delay, attempt + 1, e)
+            await asyncio.sleep(delay)
+            continue
         except Exception as e:
-            logger.error(f"Error fetching {url}: {e}")
-            return None, None
+            metrics.incr("errors", domain, type(e).__name__)
+            logger.error("Error fetching %s: %s", url, e)
+            return None
+        throttle.success(domain)
+        return page
 
-async def scrape_multiple(urls_with_selectors: List[Tuple[int, str, Optional[str]]]) -> List[Tuple[int, Optional[float]]]:
+async def _fetch_once(
+    url: str,
+    pairs: List[Tuple[Optional[str], Tuple[str, ...]]],
+    session: ScraperSession,
+    domain: str,
+) -> PageResult:
+    """A single attempt at fetching and parsing a page; HTTP errors are raised to the caller."""
+    cache = session.cache
+    logger.info("Fetching: %s", url)
+    headers = {}
+    entries = {selector: cache.get(url, selector) for selector, _ in pairs} if cache else {}
+    # Only conditional if every selector has an entry for the same version of the page
+    validators = {(e.etag, e.last_modified) for e in entries.values() if e is not None}
+    if entries and None not in entries.values() and len(validators) == 1:
+        etag, last_modified = validators.pop()
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    chains = [list(chain) for _, chain in pairs]
+    compiled = [compile_chain(chain) for chain in chains] if session.streaming else None
+    if compiled is not None and any(c is None for c in compiled):
+        compiled = None
+
+    trace = metrics.trace(domain)
+    extensions = {"trace": trace} if trace else None
+    with metrics.span("fetch", domain):
+        async with session.client.stream("GET", url, headers=headers, extensions=extensions) as response:
+            metrics.incr("status", domain, response.status_code)
+            if response.status_code == 304 and headers:
+                return _cached_page(url, pairs, cache, entries), True
+            response.raise_for_status()
+
+            body_hash = None
+            if compiled is not None:
+                # Parse while downloading and stop as soon as every price is known;
+                # leaving the stream early closes the connection. Parsing runs on the
+                # parse pool's streaming thread, off the event loop (the Qt loop in the GUI).
+                pool = session.parse_pool
+                extractor = await pool.run_streaming(StreamExtractor, compiled, response.charset_encoding)
+                parse_seconds = 0.0
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    started = time.perf_counter()
+                    done = await pool.run_streaming(extractor.feed, chunk)
+                    parse_seconds += time.perf_counter() - started
+                    if done:
+                        break
+                await pool.run_streaming(extractor.close)
+                metrics.observe("parse_seconds", domain, parse_seconds)
+                if cache:
+                    cache.miss()
+                results = extractor.results()
+            else:
+                body = await response.aread()
+                if cache:
+                    body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+                    if all(e is not None and e.body_hash == body_hash for e in entries.values()):
+                        return _cached_page(url, pairs, cache, entries), True
+                    cache.miss()
+                # Includes waiting for a free parse worker
+                with metrics.span("parse", domain):
+                    results = await session.parse_pool.extract_many(body, chains, response.charset_encoding)
+            metrics.observe("bytes", domain, response.num_bytes_downloaded)
+
+    page = {}
+    for (selector, chain), (text, price, winner) in zip(pairs, results):
+        page[chain] = (text, price, winner)
+        if cache and price is not None:
+            cache.store(
+                url, selector,
+                response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                body_hash, text, price,
+            )
+    return page, False
+
+def _cached_page(url, pairs, cache: ValidatorCache, entries) -> Dict:
+    page = {}
+    for selector, chain in pairs:
+        cache.hit(url, selector)
+        entry = entries[selector]
+        page[chain] = (entry.text, entry.price, None)
+    return page
+
+async def scrape_multiple(
+    urls_with_selectors: List[Tuple[int, str, Optional[str]]],
+    session: Optional[ScraperSession] = None,
+) -> List[Tuple[int, Optional[float]]]:
     """
-    Scrapes multiple URLs asynchronously.
+    Scrapes multiple URLs asynchronously over one shared session, with
+    bounded global and per-domain concurrency. Products sharing a URL are
+    fetched once. Results keep input order.
     """
-    tasks = []
-    for product_id, url, selector in urls_with_selectors:
-        tasks.append(fetch_with_id(product_id, url, selector))
-    
-    return await asyncio.gather(*tasks)
-
-async def fetch_with_id(product_id: int, url: str, selector: Optional[str]) -> Tuple[int, Optional[float]]:
-    _, price = await fetch_price(url, selector)
+    from core.pipeline import ScrapeJob, scrape_stream
+
+    if session is None:
+        async with ScraperSession() as temp_session:
+            return await scrape_multiple(urls_with_selectors, temp_session)
+
+    jobs = [ScrapeJob(product_id, url, selector) for product_id, url, selector in urls_with_selectors]
+    prices = {}
+    async for result in scrape_stream(jobs, session):
+        prices[result.product_id] = result.price
+    return [(job.product_id, prices.get(job.product_id)) for job in jobs]
+
+async def fetch_with_id(
+    product_id: int,
+    url: str,
+    selector: Optional[str],
+    session: Optional[ScraperSession] = None,
+) -> Tuple[int, Optional[float]]:
+    _, price = await fetch_price(url, selector, session, product_id)
     return product_id, price
 
 if __name__ == "__main__":
@@ -152,6 +426,6 @@ if __name__ == "__main__":
     async def main():
         url = "https://www.google.com"  # Replace with a real price URL for testing
         raw, price = await fetch_price(url)
-        print(f"Price: {price}")
+        logger.info("Price: %s", price)
 
     asyncio.run(main())
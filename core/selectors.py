@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from core.database import SessionLocal
+from core.models import DomainSelectorModel, ProductModel
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+class SelectorMemo:
+    """
+    Remembers which selector produced a price, per product and aggregated
+    per domain, so the winning selector is tried first on the next check.
+
+    A product's learned selector is dropped as soon as it stops matching.
+    Learned selectors are stored in products.learned_selector and domain
+    statistics in the domain_selectors table.
+    """
+
+    def __init__(self):
+        self.learned: Dict[int, Optional[str]] = {}
+        self.domain_hits: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.domain_misses: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._dirty_products: Set[int] = set()
+        self._dirty_domains: Set[Tuple[str, str]] = set()
+        self._loaded = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.lookups = 0
+        self.attempts = 0
+        self.learned_hits = 0
+        self.invalidations = 0
+
+    def load(self):
+        """Loads persisted state once; called lazily on first use otherwise."""
+        if not self._loaded:
+            self._load()
+
+    def _load(self):
+        db = SessionLocal()
+        try:
+            for product_id, selector in db.query(ProductModel.id, ProductModel.learned_selector).all():
+                self.learned[product_id] = selector
+            for row in db.query(DomainSelectorModel).all():
+                self.domain_hits[row.domain][row.selector] = row.hits or 0
+                self.domain_misses[row.domain][row.selector] = row.misses or 0
+        except Exception as e:
+            logger.error("Error loading selector memo: %s", e)
+        finally:
+            db.close()
+        self._loaded = True
+
+    def order(self, product_id: int, url: str, chain: List[str], selector: Optional[str] = None) -> List[str]:
+        """
+        Reorders a selector chain: the product's learned selector first, then
+        its user-provided selector, then selectors that won on the same domain
+        (most hits first), then the rest in their original order.
+        """
+        if not self._loaded:
+            self._load()
+        domain = urlparse(url).netloc.lower()
+        hits = self.domain_hits.get(domain, {})
+        ranked = sorted(
+            (sel for sel in chain if hits.get(sel, 0) > 0),
+            key=lambda sel: hits[sel],
+            reverse=True,
+        )
+        ordered = []
+        learned = self.learned.get(product_id)
+        if learned in chain:
+            ordered.append(learned)
+        if selector and selector not in ordered:
+            ordered.append(selector)
+        for sel in ranked + chain:
+            if sel not in ordered:
+                ordered.append(sel)
+        return ordered
+
+    def record(self, product_id: int, url: str, chain: List[str], winner: Optional[str]):
+        """Records the outcome of one extraction over an ordered chain."""
+        domain = urlparse(url).netloc.lower()
+        self.lookups += 1
+        self.attempts += chain.index(winner) + 1 if winner in chain else len(chain)
+
+        learned = self.learned.get(product_id)
+        if learned is not None and learned == winner:
+            self.learned_hits += 1
+        elif learned is not None:
+            # Learned selector stopped matching, forget it
+            self.invalidations += 1
+            misses = self.domain_misses[domain]
+            misses[learned] = misses.get(learned, 0) + 1
+            self._dirty_domains.add((domain, learned))
+
+        if winner is not None:
+            hits = self.domain_hits[domain]
+            hits[winner] = hits.get(winner, 0) + 1
+            self._dirty_domains.add((domain, winner))
+        if learned != winner:
+            self.learned[product_id] = winner
+            self._dirty_products.add(product_id)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "lookups": self.lookups,
+            "attempts": self.attempts,
+            "avg_attempts": self.attempts / self.lookups if self.lookups else 0.0,
+            "learned_hits": self.learned_hits,
+            "invalidations": self.invalidations,
+        }
+
+    def save(self):
+        if not self._dirty_products and not self._dirty_domains:
+            return
+        # Swap the change sets out first: saving may run on the DB thread
+        # while extractions keep recording on the event loop.
+        products, self._dirty_products = self._dirty_products, set()
+        domains, self._dirty_domains = self._dirty_domains, set()
+        db = SessionLocal()
+        try:
+            for product_id in products:
+                db.query(ProductModel).filter(ProductModel.id == product_id).update(
+                    {ProductModel.learned_selector: self.learned.get(product_id)},
+                    synchronize_session=False,
+                )
+            now = datetime.utcnow()
+            for domain, selector in domains:
+                db.merge(DomainSelectorModel(
+                    domain=domain,
+                    selector=selector,
+                    hits=self.domain_hits[domain].get(selector, 0),
+                    misses=self.domain_misses[domain].get(selector, 0),
+                    updated_at=now,
+                ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._dirty_products |= products
+            self._dirty_domains |= domains
+            logger.error("Error saving selector memo: %s", e)
+        finally:
+            db.close()
@@ -0,0 +1,203 @@
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from utils.helpers import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Requests per second and burst allowed per host; PRICE_TRACKER_HOST_RATE=0 turns the limit off
+HOST_RATE = float(os.environ.get("PRICE_TRACKER_HOST_RATE", "2"))
+HOST_BURST = 5
+
+# Transient failures (connection errors and these statuses) are retried
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# A longer Retry-After is not waited for: the host is paused and the product tried next time
+MAX_RETRY_AFTER = 60.0
+
+# Consecutive host failures that open the circuit, and how long the host is skipped
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 300.0
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: callers take a token right
+    away and wait for the returned delay, so concurrent fetches to one host
+    queue up in order without a lock.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Takes a token; returns the seconds to wait before using it."""
+        now = time.monotonic()
+        wait = 0.0
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+        return max(wait, self.paused_until - now)
+
+    def pause(self, seconds: float):
+        """Holds every request to the host for the given time (e.g. Retry-After)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    """
+    Opens after threshold consecutive failures. While open, requests are
+    refused; once the cooldown has passed a single trial request is let
+    through per cooldown period, and its success closes the circuit again.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown:
+            return False
+        # Half-open: this request is the trial, everyone else waits another cooldown
+        self.opened_at = now
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> bool:
+        """Records a failure; returns True if the circuit just opened."""
+        self.failures += 1
+        if self.opened_at is None and self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+class HostThrottle:
+    """
+    Per-host politeness and failure handling shared by all fetches of a
+    session: a token bucket per host, retry delays (jittered exponential
+    backoff, or the server's Retry-After) and a circuit breaker per host.
+
+    Everything it does is counted in the "throttle" metric per domain:
+    delayed, retried, retry_after, gave_up, circuit_opened and skipped
+    (requests not sent because the host's circuit was open).
+    """
+
+    def __init__(
+        self,
+        rate: float = HOST_RATE,
+        burst: int = HOST_BURST,
+        max_retries: int = MAX_RETRIES,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_cooldown: float = BREAKER_COOLDOWN,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def _bucket(self, domain: str) -> TokenBucket:
+        bucket = self.buckets.get(domain)
+        if bucket is None:
+            bucket = self.buckets[domain] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _breaker(self, domain: str) -> CircuitBreaker:
+        breaker = self.breakers.get(domain)
+        if breaker is None:
+            breaker = self.breakers[domain] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    def allow(self, domain: str) -> bool:
+        """False while the host's circuit is open."""
+        if self._breaker(domain).allow():
+            return True
+        metrics.incr("throttle", domain, "skipped")
+        return False
+
+    def reserve(self, domain: str) -> float:
+        """Seconds to wait before the next request to the host."""
+        wait = self._bucket(domain).reserve()
+        if wait > 0:
+            metrics.incr("throttle", domain, "delayed")
+            metrics.observe("throttle_wait_seconds", domain, wait)
+        return wait
+
+    def success(self, domain: str):
+        self._breaker(domain).success()
+
+    def failure(self, domain: str) -> bool:
+        """Records a failed request; returns False once the host's circuit is open."""
+        breaker = self._breaker(domain)
+        if breaker.failure():
+            metrics.incr("throttle", domain, "circuit_opened")
+            logger.warning("Circuit opened for %s: skipping it for %.0fs.", domain, self.breaker_cooldown)
+        return not breaker.is_open
+
+    def retry_delay(self, domain: str, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to wait before retry number attempt (1-based), or None to
+        give up. A Retry-After pauses the whole host rather than just this
+        request; the wait then happens in reserve().
+        """
+        if attempt > self.max_retries or (retry_after is not None and retry_after > MAX_RETRY_AFTER):
+            if retry_after:
+                self._bucket(domain).pause(min(retry_after, self.breaker_cooldown))
+            metrics.incr("throttle", domain, "gave_up")
+            return None
+        metrics.incr("throttle", domain, "retried")
+        if retry_after is not None:
+            metrics.incr("throttle", domain, "retry_after")
+            self._bucket(domain).pause(retry_after)
+            return 0.0
+        # Full jitter, so retries from many products do not arrive together
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def open_circuits(self) -> Dict[str, float]:
+        """Hosts currently skipped, with the seconds left until their next trial request."""
+        now = time.monotonic()
+        return {
+            domain: max(0.0, breaker.opened_at + breaker.cooldown - now)
+            for domain, breaker in self.breakers.items() if breaker.is_open
+        }
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from core.models import PriceHistoryModel, PriceRollupModel
+
+# Rollup resolutions, from finest to coarsest
+ROLLUP_RESOLUTIONS = ("hour", "day")
+
+# Above this many raw points in a range, charts are built from rollups
+RAW_POINT_LIMIT = 50000
+
+DEFAULT_MAX_POINTS = 800
+
+class Series(NamedTuple):
+    timestamps: List[datetime]
+    prices: List[float]
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "week":
+        day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+def update_rollups(conn, rows: Sequence[Dict]):
+    """
+    Folds new history rows (product_id, price, timestamp) into the hourly
+    and daily rollups. Runs inside the caller's transaction.
+    """
+    if not rows:
+        return
+    table = PriceRollupModel.__table__
+    # Upserts are dialect-specific; SQLite's two-argument min/max are least/greatest elsewhere
+    if conn.dialect.name == "sqlite":
+        stmt, least, greatest = sqlite_insert(table), func.min, func.max
+    elif conn.dialect.name == "postgresql":
+        stmt, least, greatest = postgresql_insert(table), func.least, func.greatest
+    else:
+        raise RuntimeError(f"Unsupported database backend {conn.dialect.name!r} (use SQLite or PostgreSQL).")
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.product_id, table.c.resolution, table.c.bucket_start],
+        set_={
+            "min_price": least(table.c.min_price, stmt.excluded.min_price),
+            "max_price": greatest(table.c.max_price, stmt.excluded.max_price),
+            "sum_price": table.c.sum_price + stmt.excluded.sum_price,
+            "count": table.c.count + stmt.excluded.count,
+            "last_price": case(
+                (stmt.excluded.last_timestamp >= table.c.last_timestamp, stmt.excluded.last_price),
+                else_=table.c.last_price,
+            ),
+            "last_timestamp": greatest(table.c.last_timestamp, stmt.excluded.last_timestamp),
+        },
+    )
+    params = []
+    for row in rows:
+        for resolution in ROLLUP_RESOLUTIONS:
+            params.append({
+                "product_id": row["product_id"],
+                "resolution": resolution,
+                "bucket_start": bucket_start(row["timestamp"], resolution),
+                "min_price": row["price"],
+                "max_price": row["price"],
+                "sum_price": row["price"],
+                "count": 1,
+                "last_price": row["price"],
+                "last_timestamp": row["timestamp"],
+            })
+    conn.execute(stmt, params)
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the
+    points to keep, always including the first and last point.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    keep = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # Point in this bucket forming the largest triangle with a and the average
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return keep
+
+def _raw_series(db, product_id: int, start: Optional[datetime], end: Optional[datetime]) -> Series:
+    """Raw points; run-length rows contribute a point at both ends of the run."""
+    seen_until = func.coalesce(PriceHistoryModel.last_seen, PriceHistoryModel.timestamp)
+    query = select(PriceHistoryModel.timestamp, seen_until, PriceHistoryModel.price).where(
+        PriceHistoryModel.product_id == product_id
+    )
+    if start:
+        query = query.where(seen_until >= start)
+    if end:
+        query = query.where(PriceHistoryModel.timestamp <= end)
+    timestamps, prices = [], []
+    for first, last, price in db.execute(query.order_by(PriceHistoryModel.timestamp)):
+        first = max(first, start) if start else first
+        last = min(last, end) if end else last
+        timestamps.append(first)
+        prices.append(price)
+        if last > first:
+            timestamps.append(last)
+            prices.append(price)
+    return Series(timestamps, prices)
+
+def _rollup_series(db, product_id: int, start: Optional[datetime], end: Optional[datetime]) -> Series:
+    """Min/max per bucket from the finest rollup that fits RAW_POINT_LIMIT."""
+    for resolution in ROLLUP_RESOLUTIONS:
+        query = select(
+            PriceRollupModel.bucket_start, PriceRollupModel.min_price, PriceRollupModel.max_price
+        ).where(
+            PriceRollupModel.product_id == product_id,
+            PriceRollupModel.resolution == resolution,
+        )
+        if start:
+            query = query.where(PriceRollupModel.bucket_start >= bucket_start(start, resolution))
+        if end:
+            query = query.where(PriceRollupModel.bucket_start <= end)
+        count = db.execute(select(func.count()).select_from(query.subquery())).scalar()
+        if count * 2 <= RAW_POINT_LIMIT or resolution == ROLLUP_RESOLUTIONS[-1]:
+            break
+
+    half = timedelta(hours=0.5) if resolution == "hour" else timedelta(hours=12)
+    timestamps, prices = [], []
+    for bucket, low, high in db.execute(query.order_by(PriceRollupModel.bucket_start)):
+        timestamps.extend((bucket, bucket + half))
+        prices.extend((low, high))
+    return Series(timestamps, prices)
+
+def get_series(
+    db,
+    product_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> Series:
+    """
+    Returns a product's price history over [start, end] as column lists,
+    downsampled to at most max_points while preserving its shape.
+
+    Small ranges come straight from price_history; very long ones are read
+    from the hourly/daily rollups so the raw rows are never loaded.
+    """
+    query = select(func.count()).select_from(PriceHistoryModel).where(
+        PriceHistoryModel.product_id == product_id
+    )
+    if start:
+        query = query.where(func.coalesce(PriceHistoryModel.last_seen, PriceHistoryModel.timestamp) >= start)
+    if end:
+        query = query.where(PriceHistoryModel.timestamp <= end)
+    count = db.execute(query).scalar()
+
+    if count > RAW_POINT_LIMIT:
+        series = _rollup_series(db, product_id, start, end)
+    else:
+        series = _raw_series(db, product_id, start, end)
+    if len(series.timestamps) <= max_points:
+        return series
+
+    xs = [t.timestamp() for t in series.timestamps]
+    keep = lttb(xs, series.prices, max_points)
+    return Series([series.timestamps[i] for i in keep], [series.prices[i] for i in keep])
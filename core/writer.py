@@ -0,0 +1,132 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from core.database import engine
+from core.models import ProductModel, PriceHistoryModel
+from core.timeseries import update_rollups
+from utils.helpers import setup_logger
+from utils.metrics import LOCAL, metrics
+
+logger = setup_logger(__name__)
+
+WRITE_BATCH_SIZE = 200
+
+# "changes": a repeated price extends the product's last row (last_seen)
+# instead of adding a new one. "all": one row per observation.
+HISTORY_MODE = "changes"
+
+class PriceWriter:
+    """
+    Buffers scraped prices and writes them in chunks.
+
+    Each chunk is one short transaction of Core executemany statements
+    (history insert, latest price update, rollup upsert and next check
+    times), so a failure only loses that chunk and readers are never
+    blocked for a whole cycle.
+    """
+
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE, mode: str = HISTORY_MODE):
+        self.batch_size = batch_size
+        self.mode = mode
+        self.written = 0
+        self.failed = 0
+        self._pending: List[Dict] = []
+        self._schedule: List[Dict] = []
+
+    def add(self, product_id: int, price: float, timestamp: Optional[datetime] = None) -> bool:
+        """Buffers a price; returns True once a full batch is waiting to be flushed."""
+        self._pending.append({
+            "product_id": product_id,
+            "price": price,
+            "timestamp": timestamp or datetime.utcnow(),
+        })
+        return self._full()
+
+    def reschedule(self, product_id: int, next_check: datetime, error_count: int) -> bool:
+        """Buffers a product's next check time and error count, written with the next flush."""
+        self._schedule.append({"b_id": product_id, "b_next": next_check, "b_errors": error_count})
+        return self._full()
+
+    def _full(self) -> bool:
+        return len(self._pending) + len(self._schedule) >= self.batch_size
+
+    def flush(self) -> int:
+        if not self._pending and not self._schedule:
+            return 0
+        rows, self._pending = self._pending, []
+        schedule, self._schedule = self._schedule, []
+        try:
+            with metrics.span("db_write"), engine.begin() as conn:
+                if rows:
+                    self._write_prices(conn, rows)
+                if schedule:
+                    products = ProductModel.__table__
+                    conn.execute(
+                        update(products)
+                        .where(products.c.id == bindparam("b_id"))
+                        .values(next_check=bindparam("b_next"), error_count=bindparam("b_errors")),
+                        schedule,
+                    )
+            metrics.observe("db_write_rows", LOCAL, len(rows))
+            self.written += len(rows)
+            return len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            logger.error("Error writing %s prices: %s", len(rows), e)
+            return 0
+
+    def _write_prices(self, conn, rows: List[Dict]):
+        if self.mode == "changes":
+            inserts, extends = self._split_runs(conn, rows)
+        else:
+            inserts, extends = rows, []
+        history = PriceHistoryModel.__table__
+        if extends:
+            latest = select(func.max(history.c.timestamp)).where(
+                history.c.product_id == bindparam("b_id")
+            ).scalar_subquery()
+            conn.execute(
+                update(history)
+                .where(history.c.product_id == bindparam("b_id"), history.c.timestamp == latest)
+                .values(last_seen=bindparam("b_seen")),
+                extends,
+            )
+        if inserts:
+            conn.execute(insert(history), inserts)
+        conn.execute(
+            update(ProductModel.__table__)
+            .where(ProductModel.__table__.c.id == bindparam("b_id"))
+            .values(last_price=bindparam("b_price"), last_checked=bindparam("b_timestamp")),
+            [{"b_id": r["product_id"], "b_price": r["price"], "b_timestamp": r["timestamp"]} for r in rows],
+        )
+        update_rollups(conn, rows)
+
+    @staticmethod
+    def _split_runs(conn, rows: List[Dict]):
+        """
+        Splits a chunk into new history rows and extensions of each product's
+        current run. Repeats within the chunk are folded into last_seen.
+        """
+        products = ProductModel.__table__
+        ids = list({r["product_id"] for r in rows})
+        current = dict(conn.execute(
+            select(products.c.id, products.c.last_price).where(products.c.id.in_(ids))
+        ).all())
+        inserts: List[Dict] = []
+        open_run: Dict[int, Dict] = {}  # product id -> row inserted in this chunk
+        extends: Dict[int, Dict] = {}
+        for r in sorted(rows, key=lambda r: r["timestamp"]):
+            product_id = r["product_id"]
+            if current.get(product_id) == r["price"]:
+                if product_id in open_run:
+                    open_run[product_id]["last_seen"] = r["timestamp"]
+                else:
+                    extends[product_id] = {"b_id": product_id, "b_seen": r["timestamp"]}
+            else:
+                row = {"product_id": product_id, "price": r["price"], "timestamp": r["timestamp"], "last_seen": None}
+                inserts.append(row)
+                open_run[product_id] = row
+                current[product_id] = r["price"]
+        return inserts, list(extends.values())
@@ -1,39 +1,87 @@
+import time
+
+PROCESS_START = time.perf_counter()
+
+import argparse
 import sys
 import asyncio
-from qasync import QEventLoop
-from PyQt6.QtWidgets import QApplication
-from qt_material import apply_stylesheet
 
-from ui.main_window import MainWindow
-from core.migration import initialize_database, migrate_from_json
 from utils.helpers import setup_logger
 
 logger = setup_logger(__name__)
 
-async def main():
+# GUI and daemon dependencies are imported inside their entry points, so
+# the headless daemon never loads Qt, qt_material or matplotlib.
+
+async def main(client_mode: bool = False):
+    from qasync import QEventLoop
+    from PyQt6.QtWidgets import QApplication
+    from qt_material import apply_stylesheet
+
+    from ui.main_window import MainWindow
+    from core.migration import initialize_database, migrate_from_json
+    from core.repository import get_repository
+    from utils.metrics import METRICS_ENABLED, METRICS_PORT, MetricsServer
+
     logger.info("Starting Price Tracker Application...")
-    
-    # Initialize DB and Migrate
-    initialize_database()
-    migrate_from_json("data.json")
-    
+
+    # Initialize DB and Migrate on the repository's DB thread
+    repository = get_repository()
+    await repository.call(initialize_database)
+    await repository.call(migrate_from_json, "data.json")
+
+    if METRICS_ENABLED and METRICS_PORT and not client_mode:
+        MetricsServer(METRICS_PORT).start()
+
     app = QApplication(sys.argv)
     loop = QEventLoop(app)
     asyncio.set_event_loop(loop)
-    
+
     # Apply modern theme
     apply_stylesheet(app, theme='dark_teal.xml')
-    
-    window = MainWindow()
+
+    window = MainWindow(client_mode=client_mode)
     window.show()
-    
+
     with loop:
         loop.run_forever()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Product price tracker.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    gui = subparsers.add_parser("gui", help="Desktop application (default)")
+    gui.add_argument(
+        "--client", action="store_true",
+        help="Leave scheduled checks to a running daemon (detected automatically)",
+    )
+
+    daemon = subparsers.add_parser("daemon", help="Headless scheduler without GUI imports")
+    daemon.add_argument("--interval-hours", type=float, default=1, help="Base check interval")
+    daemon.add_argument("--startup-only", action="store_true", help="Exit once ready (measures cold start)")
+
+    worker = subparsers.add_parser("worker", help="Scrape workers sharing the job queue in the database")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--batch-size", type=int, default=50, help="Products claimed per lease")
+    worker.add_argument("--interval-hours", type=float, default=1, help="Base check interval")
+    worker.add_argument("--requests-per-minute", type=int, default=120, help="Budget shared by this host's processes")
+    worker.add_argument("--lease-seconds", type=int, default=120)
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        if args.command == "daemon":
+            from services.daemon import run_daemon
+            asyncio.run(run_daemon(PROCESS_START, args.interval_hours, args.startup_only))
+        elif args.command == "worker":
+            from services.worker import run_workers
+            run_workers(args.processes, args.batch_size, args.interval_hours, args.requests_per_minute, args.lease_seconds)
+        else:
+            from services.daemon import daemon_running
+            client_mode = getattr(args, "client", False) or daemon_running()
+            asyncio.run(main(client_mode))
     except KeyboardInterrupt:
         pass
     except Exception as e:
-        logger.error(f"Application crashed: {e}")
+        logger.error("Application crashed: %s", e)
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import signal
+import time
+from typing import Optional
+
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+PID_FILE = os.environ.get("PRICE_TRACKER_PID_FILE", "price_tracker.pid")
+
+# Seconds from process start to a running scheduler; slower starts are logged as warnings
+COLD_START_TARGET = 1.0
+
+def daemon_running(pid_file: str = PID_FILE) -> bool:
+    """True when a daemon process recorded in pid_file is alive."""
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+        return True
+    except (OSError, ValueError):
+        return False
+
+def _write_pid_file(pid_file: str):
+    with open(pid_file, "w") as f:
+        f.write(str(os.getpid()))
+
+def _remove_pid_file(pid_file: str):
+    try:
+        with open(pid_file) as f:
+            if int(f.read().strip()) != os.getpid():
+                return
+        os.remove(pid_file)
+    except (OSError, ValueError):
+        pass
+
+async def run_daemon(
+    process_start: float,
+    interval_hours: float = 1,
+    startup_only: bool = False,
+    pid_file: str = PID_FILE,
+):
+    """
+    Runs the price scheduler without any GUI until SIGTERM/SIGINT.
+
+    Only the database, scraper and scheduler modules are imported (no Qt or
+    matplotlib). process_start is the time.perf_counter() value taken at
+    the top of main.py and is used to report the cold start time. With
+    startup_only the daemon exits as soon as it is ready, to measure that.
+    """
+    from core.migration import initialize_database, migrate_from_json
+    from core.repository import get_repository
+    from services.scheduler import PriceScheduler
+    from utils.metrics import METRICS_ENABLED, METRICS_PORT, MetricsServer
+
+    if daemon_running(pid_file):
+        logger.error("Another daemon is already running (see %s).", pid_file)
+        return
+
+    repository = get_repository()
+    await repository.call(initialize_database)
+    await repository.call(migrate_from_json, "data.json")
+
+    metrics_server: Optional[MetricsServer] = None
+    if METRICS_ENABLED and METRICS_PORT:
+        metrics_server = MetricsServer(METRICS_PORT)
+        metrics_server.start()
+
+    scheduler = PriceScheduler(interval_hours=interval_hours, repository=repository)
+    scheduler.start()
+    _write_pid_file(pid_file)
+
+    elapsed = time.perf_counter() - process_start
+    if elapsed > COLD_START_TARGET:
+        logger.warning("Daemon ready in %.0f ms (target %.0f ms).", elapsed * 1000, COLD_START_TARGET * 1000)
+    else:
+        logger.info("Daemon ready in %.0f ms.", elapsed * 1000)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+
+    try:
+        if not startup_only:
+            # First tick right away instead of after tick_seconds
+            asyncio.create_task(scheduler.check_due())
+            await stop.wait()
+    finally:
+        logger.info("Daemon stopping...")
+        await scheduler.close()
+        scheduler.session.parse_pool.shutdown()
+        repository.shutdown()
+        if metrics_server:
+            metrics_server.stop()
+        _remove_pid_file(pid_file)
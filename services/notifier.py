@@ -1,26 +1,333 @@
+import asyncio
+import json
 import os
 import platform
-import subprocess
-import logging
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
 from utils.helpers import setup_logger
 
 logger = setup_logger(__name__)
 
-class Notifier:
-    @staticmethod
-    def notify(title: str, message: str):
-        """Send a desktop notification."""
-        logger.info(f"Notification: {title} - {message}")
-        
+# Changes arriving within this many seconds of the first one are handled together
+COALESCE_SECONDS = 2.0
+# More alerts than this in one batch are sent as a single digest
+DIGEST_THRESHOLD = 3
+DIGEST_LINES = 5
+# Bounded queues: the scheduler never waits on notifications, overflow is counted and dropped
+MAX_PENDING_CHANGES = 10000
+SINK_QUEUE_SIZE = 100
+
+# Smallest price move, in percent, that alerts (0: every change); target prices always alert
+ALERT_MIN_PCT = float(os.environ.get("PRICE_TRACKER_ALERT_MIN_PCT", "0"))
+
+# Optional extra sinks
+WEBHOOK_URL = os.environ.get("PRICE_TRACKER_WEBHOOK_URL")
+NOTIFY_FILE = os.environ.get("PRICE_TRACKER_NOTIFY_FILE")
+
+class PriceChange(NamedTuple):
+    product_id: int
+    name: str
+    old_price: float
+    new_price: float
+    target_price: Optional[float] = None
+
+    @property
+    def change_pct(self) -> float:
+        return (self.new_price - self.old_price) / self.old_price * 100 if self.old_price else 0.0
+
+class Alert(NamedTuple):
+    change: PriceChange
+    kind: str  # "drop", "rise" or "target"
+
+    @property
+    def message(self) -> str:
+        c = self.change
+        if self.kind == "target":
+            return f"{c.name} reached your target: {c.new_price} (target {c.target_price})"
+        verb = "dropped" if self.kind == "drop" else "increased"
+        return f"{c.name} {verb} from {c.old_price} to {c.new_price} ({c.change_pct:+.1f}%)"
+
+# Rules
+
+class ChangeRule:
+    """Alerts on drops (and optionally rises) of at least min_pct percent."""
+
+    def __init__(self, min_pct: float = ALERT_MIN_PCT, rises: bool = True):
+        self.min_pct = min_pct
+        self.rises = rises
+
+    def evaluate(self, changes: Sequence[PriceChange]) -> List[Alert]:
+        alerts = []
+        for c in changes:
+            pct = c.change_pct
+            if pct < 0 and -pct >= self.min_pct:
+                alerts.append(Alert(c, "drop"))
+            elif pct > 0 and self.rises and pct >= self.min_pct:
+                alerts.append(Alert(c, "rise"))
+        return alerts
+
+class TargetPriceRule:
+    """Alerts when a product's price falls to its target price (crossing only)."""
+
+    def evaluate(self, changes: Sequence[PriceChange]) -> List[Alert]:
+        return [
+            Alert(c, "target") for c in changes
+            if c.target_price is not None and c.new_price <= c.target_price < c.old_price
+        ]
+
+def default_rules() -> List:
+    return [ChangeRule(), TargetPriceRule()]
+
+def evaluate_rules(changes: Sequence[PriceChange], rules: Sequence) -> List[Alert]:
+    """Runs every rule over the whole batch; a target alert replaces a plain drop alert."""
+    alerts: Dict[int, Alert] = {}
+    for rule in rules:
+        for alert in rule.evaluate(changes):
+            current = alerts.get(alert.change.product_id)
+            if current is None or alert.kind == "target":
+                alerts[alert.change.product_id] = alert
+    return list(alerts.values())
+
+# Sinks
+
+class Sink:
+    """
+    Notification destination with its own bounded queue and sender task,
+    so a slow or failing sink never holds up the others.
+    """
+
+    name = "sink"
+
+    def __init__(self, queue_size: int = SINK_QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.sent = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def offer(self, title: str, message: str, alerts: List[Alert]):
+        try:
+            self.queue.put_nowait((title, message, alerts))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Notification sink %s is backed up, dropped: %s", self.name, title)
+
+    async def _run(self):
+        while True:
+            title, message, alerts = await self.queue.get()
+            try:
+                await self.send(title, message, alerts)
+                self.sent += 1
+            except Exception as e:
+                logger.error("Notification sink %s failed: %s", self.name, e)
+            finally:
+                self.queue.task_done()
+
+    async def send(self, title: str, message: str, alerts: List[Alert]):
+        raise NotImplementedError
+
+    async def close(self):
+        if self._task is not None:
+            await self.queue.join()
+            self._task.cancel()
+            self._task = None
+
+class DesktopSink(Sink):
+    """notify-send / osascript, spawned without blocking the event loop."""
+
+    name = "desktop"
+
+    async def send(self, title: str, message: str, alerts: List[Alert]):
         system = platform.system()
+        if system == "Linux":
+            args = ["notify-send", title, message]
+        elif system == "Darwin":
+            args = ["osascript", "-e", f'display notification "{message}" with title "{title}"']
+        else:
+            return
         try:
-            if system == "Linux":
-                subprocess.run(["notify-send", title, message], check=False)
-            elif system == "Windows":
-                # Fallback for Windows if plyer/win10toast not installed
-                # In a real app, we'd use a library.
-                pass
-            elif system == "Darwin": # macOS
-                subprocess.run(["osascript", "-e", f'display notification "{message}" with title "{title}"'], check=False)
-        except Exception as e:
-            logger.error(f"Failed to send notification: {e}")
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            return  # No notification daemon (e.g. a headless server)
+        await process.wait()
+
+class WebhookSink(Sink):
+    """POSTs {"title", "message", "alerts": [...]} as JSON."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10.0, queue_size: int = SINK_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+
+    async def send(self, title: str, message: str, alerts: List[Alert]):
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.post(self.url, json={
+            "title": title,
+            "message": message,
+            "alerts": [{"kind": a.kind, **a.change._asdict()} for a in alerts],
+        })
+        response.raise_for_status()
+
+    async def close(self):
+        await super().close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class FileSink(Sink):
+    """Appends one JSON line per notification."""
+
+    name = "file"
+
+    def __init__(self, path: str, queue_size: int = SINK_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.path = path
+
+    async def send(self, title: str, message: str, alerts: List[Alert]):
+        line = json.dumps({
+            "time": datetime.utcnow().isoformat(),
+            "title": title,
+            "message": message,
+            "alerts": [{"kind": a.kind, **a.change._asdict()} for a in alerts],
+        })
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+def default_sinks() -> List[Sink]:
+    sinks: List[Sink] = [DesktopSink()]
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink(WEBHOOK_URL))
+    if NOTIFY_FILE:
+        sinks.append(FileSink(NOTIFY_FILE))
+    return sinks
+
+# Pipeline
+
+class NotificationQueue:
+    """
+    Collects price changes from scrape cycles and notifies off the hot path.
+
+    submit() never blocks. A dispatcher task gathers changes for
+    coalesce_seconds, keeps one change per product and evaluates the rules
+    over the whole batch. A few alerts are sent one by one; a burst (e.g. a
+    store-wide sale) becomes a single digest. Every sink gets its own
+    bounded queue.
+    """
+
+    def __init__(
+        self,
+        sinks: Optional[List[Sink]] = None,
+        rules: Optional[List] = None,
+        coalesce_seconds: float = COALESCE_SECONDS,
+        digest_threshold: int = DIGEST_THRESHOLD,
+        max_pending: int = MAX_PENDING_CHANGES,
+    ):
+        self._sinks = sinks
+        self.rules = rules if rules is not None else default_rules()
+        self.coalesce_seconds = coalesce_seconds
+        self.digest_threshold = digest_threshold
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.alerts = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def sinks(self) -> List[Sink]:
+        # Created lazily: sinks need a running event loop
+        if self._sinks is None:
+            self._sinks = default_sinks()
+        return self._sinks
+
+    def submit(self, change: PriceChange):
+        """Queues a price change; called from the event loop."""
+        if self._task is None:
+            self._start()
+        try:
+            self._queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _start(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        for sink in self.sinks:
+            sink.start()
+        self._task = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.coalesce_seconds
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                logger.error("Error dispatching notifications: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch: List[PriceChange]):
+        # One change per product: from the first old price to the latest new one
+        merged: Dict[int, PriceChange] = {}
+        for change in batch:
+            first = merged.get(change.product_id)
+            merged[change.product_id] = change if first is None else change._replace(old_price=first.old_price)
+        alerts = evaluate_rules([c for c in merged.values() if c.new_price != c.old_price], self.rules)
+        if not alerts:
+            return
+        self.alerts += len(alerts)
+        dropped, self.dropped = self.dropped, 0
+
+        if len(alerts) <= self.digest_threshold and not dropped:
+            for alert in alerts:
+                title = {"drop": "Price Drop!", "rise": "Price Rise!", "target": "Target Price Reached!"}[alert.kind]
+                self._send(title, alert.message, [alert])
+            return
+
+        # Biggest drops first
+        alerts.sort(key=lambda a: (a.kind != "target", a.change.change_pct))
+        drops = sum(1 for a in alerts if a.kind != "rise")
+        lines = [a.message for a in alerts[:DIGEST_LINES]]
+        more = max(0, len(alerts) - DIGEST_LINES) + dropped
+        if more > 0:
+            lines.append(f"...and {more} more")
+        self._send(f"{len(alerts)} price changes ({drops} down)", "\n".join(lines), alerts)
+
+    def _send(self, title: str, message: str, alerts: List[Alert]):
+        logger.info("Notification: %s - %s", title, message)
+        for sink in self.sinks:
+            sink.offer(title, message, alerts)
+
+    async def close(self):
+        """Delivers what is pending and stops the dispatcher and sinks."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+        for sink in self.sinks:
+            await sink.close()
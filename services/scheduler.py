@@ -1,62 +1,256 @@
 import asyncio
+import time
 from datetime import datetime
+from typing import Callable, Dict, List, Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from core.database import SessionLocal
-from core.models import ProductModel, PriceHistoryModel
-from core.scraper import fetch_price
-from services.notifier import Notifier
+from core.cache import ValidatorCache
+from core.maintenance import MAINTENANCE_WINDOW, MaintenanceRun, parse_window, window_end
+from core.polling import (
+    REQUESTS_PER_MINUTE,
+    TICK_SECONDS,
+    VOLATILITY_WINDOW_DAYS,
+    change_rates,
+    due_products,
+    next_check_time,
+    spread_unscheduled,
+)
+from core.repository import AsyncRepository, get_repository
+from core.pipeline import ScrapeJob, ScrapeResult, scrape_stream
+from core.scraper import ScraperSession
+from core.selectors import SelectorMemo
+from core.writer import WRITE_BATCH_SIZE, PriceWriter
+from services.notifier import NotificationQueue, PriceChange
 from utils.helpers import setup_logger
+from utils.metrics import LOCAL, metrics
 
 logger = setup_logger(__name__)
 
 class PriceScheduler:
-    def __init__(self, interval_hours: int = 1):
+    """
+    Checks each product on its own schedule.
+
+    Every product has a next check time derived from how often its price
+    changes, its priority and recent errors (see core.polling). A tick every
+    tick_seconds scrapes the products that are due, most overdue first, up
+    to the global requests_per_minute budget; whatever does not fit waits
+    for the next tick. interval_hours is the base interval for a product of
+    average volatility.
+
+    Cycles that overlap (a manual refresh during a tick, or two refreshes)
+    merge: a product already being checked by one cycle is not scraped
+    again by the other, which waits for that result instead.
+
+    Database maintenance (retention, statistics, vacuum; see
+    core.maintenance) runs daily in the maintenance_window, in short steps
+    between the cycles' database work.
+    """
+
+    def __init__(
+        self,
+        interval_hours: float = 1,
+        write_batch_size: int = WRITE_BATCH_SIZE,
+        repository: Optional[AsyncRepository] = None,
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        tick_seconds: int = TICK_SECONDS,
+        maintenance_window: Optional[str] = MAINTENANCE_WINDOW,
+    ):
         self.scheduler = AsyncIOScheduler()
+        self.repository = repository or get_repository()
         self.interval_hours = interval_hours
+        self.write_batch_size = write_batch_size
+        self.requests_per_minute = requests_per_minute
+        self.tick_seconds = tick_seconds
+        self.maintenance_window = parse_window(maintenance_window)
+        self.session = ScraperSession(cache=ValidatorCache(), memo=SelectorMemo())
+        self.notifications = NotificationQueue()
+        # Called with every ScrapeResult of every cycle
+        self.result_callbacks: List[Callable[[ScrapeResult], None]] = []
+        # Products being checked by a running cycle, resolved with their result
+        self._active: Dict[int, asyncio.Future] = {}
         self._is_running = False
+        self._spread = False
+        self._tick_running = False
+        self._maintenance_running = False
+
+    async def check_all_prices(
+        self,
+        session: Optional[ScraperSession] = None,
+        progress_callback: Optional[Callable[[int, int, ScrapeResult], None]] = None,
+    ):
+        """Scrape every product now, regardless of schedule (used by the UI refresh)."""
+        now = datetime.utcnow()
+        try:
+            products = await self.repository.list_products()
+            rates = await self.repository.run(change_rates, None, now)
+        except Exception as e:
+            logger.error("Error loading products: %s", e)
+            return
+        await self.run_cycle(products, rates, session, progress_callback)
+
+    async def check_due(self):
+        """Scrape the products whose next check is due, within the requests-per-minute budget."""
+        if self._tick_running:
+            return
+        self._tick_running = True
+        try:
+            if not self._spread:
+                await self.repository.run(spread_unscheduled, self.interval_hours)
+                self._spread = True
+            budget = max(1, self.requests_per_minute * self.tick_seconds // 60)
+            products, rates = await self.repository.run(due_products, datetime.utcnow(), budget)
+            if products:
+                await self.run_cycle(products, rates)
+        except Exception as e:
+            logger.error("Error checking due products: %s", e)
+        finally:
+            self._tick_running = False
+
+    async def run_cycle(
+        self,
+        products: List,
+        rates: Dict[int, float],
+        session: Optional[ScraperSession] = None,
+        progress_callback: Optional[Callable[[int, int, ScrapeResult], None]] = None,
+    ):
+        """
+        Scrape the given products, save history and reschedule them.
 
-    async def check_all_prices(self):
-        """Scrape all products and save history."""
-        logger.info("Background price check started.")
-        db = SessionLocal()
+        Results are streamed back from the scrape pipeline as they finish and
+        saved in chunks of write_batch_size, so progress and DB writes advance
+        without waiting for the rest of the cycle.
+        """
+        session = session or self.session
+        loop = asyncio.get_running_loop()
+        joined = [self._active[p.id] for p in products if p.id in self._active]
+        products = {p.id: p for p in products if p.id not in self._active}
+        for product_id in products:
+            self._active[product_id] = loop.create_future()
+        total = len(products) + len(joined)
+        if joined:
+            logger.info(
+                "Price check started for %s products (%s already being checked).", len(products), len(joined)
+            )
+        else:
+            logger.info("Price check started for %s products.", len(products))
+        started = time.perf_counter()
+        writer = PriceWriter(self.write_batch_size)
+        done = 0
         try:
-            products = db.query(ProductModel).all()
-            for product in products:
-                _, price = await fetch_price(product.url, product.selector)
-                if price is not None:
-                    # Get last price
-                    last_history = db.query(PriceHistoryModel).filter(
-                        PriceHistoryModel.product_id == product.id
-                    ).order_by(PriceHistoryModel.timestamp.desc()).first()
-                    
-                    if last_history:
-                        old_price = last_history.price
-                        if price < old_price:
-                            Notifier.notify("Price Drop!", f"{product.name} dropped from {old_price} to {price}!")
-                        elif price > old_price:
-                            Notifier.notify("Price Rise!", f"{product.name} increased from {old_price} to {price}!")
-                    
-                    # Save new price
-                    history = PriceHistoryModel(product_id=product.id, price=price)
-                    db.add(history)
-            
-            db.commit()
-            logger.info("Background price check completed.")
+            await self.repository.call(session.load_state)
         except Exception as e:
-            db.rollback()
-            logger.error(f"Error in background check: {e}")
+            logger.error("Error loading scraper state: %s", e)
+            self._resolve(products.values())
+            return
+
+        try:
+            jobs = [ScrapeJob(p.id, p.url, p.selector) for p in products.values()]
+            async for result in scrape_stream(jobs, session):
+                done += 1
+                product = products[result.product_id]
+                rate = rates.get(product.id, 0.0)
+                if result.price is not None:
+                    if self._check_change(product, result.price):
+                        rate += 1 / VOLATILITY_WINDOW_DAYS
+                    writer.add(result.product_id, result.price)
+                    errors = 0
+                else:
+                    errors = (product.error_count or 0) + 1
+                next_check = next_check_time(datetime.utcnow(), self.interval_hours, rate, product.priority, errors)
+                if writer.reschedule(product.id, next_check, errors):
+                    await self.repository.call(writer.flush)
+                self._resolve([product], result)
+                for callback in self.result_callbacks:
+                    callback(result)
+                if progress_callback:
+                    progress_callback(done, total, result)
+            await self.repository.call(writer.flush)
+
+            await self.repository.call(session.save_state)
+            if session.cache:
+                stats = session.cache.stats()
+                logger.info("Page cache: %s hits, %s misses.", stats['hits'], stats['misses'])
+            if session.memo:
+                stats = session.memo.stats()
+                logger.info(
+                    "Selectors: %s attempts for %s pages (%s learned hits, %s invalidated).",
+                    stats['attempts'], stats['lookups'], stats['learned_hits'], stats['invalidations'],
+                )
+                session.memo.reset_stats()
+            cooling = session.throttle.open_circuits()
+            if cooling:
+                logger.warning(
+                    "Hosts skipped after repeated failures: %s",
+                    ", ".join(f"{domain} ({seconds:.0f}s left)" for domain, seconds in sorted(cooling.items())),
+                )
+            metrics.observe("cycle_seconds", LOCAL, time.perf_counter() - started)
+            logger.info("Price check completed: %s saved, %s failed.", writer.written, writer.failed)
+        except Exception as e:
+            await self.repository.call(writer.flush)
+            logger.error("Error in price check: %s", e)
+        finally:
+            self._resolve(products.values())
+
+        # Products another cycle was already checking
+        for future in asyncio.as_completed(joined):
+            result = await future
+            done += 1
+            if progress_callback:
+                progress_callback(done, total, result)
+
+    def _resolve(self, products, result: Optional[ScrapeResult] = None):
+        """Hands this cycle's results to overlapping cycles waiting on the same products."""
+        for product in products:
+            future = self._active.pop(product.id, None)
+            if future is not None and not future.done():
+                future.set_result(result or ScrapeResult(product.id, product.url, None, None))
+
+    def _check_change(self, product, price: float) -> bool:
+        """Queues a price change for notification; returns whether the price changed."""
+        old_price = product.last_price
+        if old_price is None or price == old_price:
+            return False
+        self.notifications.submit(PriceChange(product.id, product.name, old_price, price, product.target_price))
+        return True
+
+    async def run_maintenance(self, deadline: Optional[datetime] = None):
+        """Runs a maintenance pass step by step until it is done or the deadline (local time) passes."""
+        if self._maintenance_running:
+            return
+        if deadline is None and self.maintenance_window:
+            deadline = window_end(datetime.now(), self.maintenance_window)
+        self._maintenance_running = True
+        run = MaintenanceRun(deadline=deadline)
+        try:
+            # Each step is queued on the DB thread like any other call, so cycles keep writing in between
+            while await self.repository.call(run.step):
+                pass
+            metrics.observe("maintenance_seconds", LOCAL, run.report["seconds"])
+        except Exception as e:
+            logger.error("Error in database maintenance: %s", e)
         finally:
-            db.close()
+            self._maintenance_running = False
 
     def start(self):
         if not self._is_running:
-            self.scheduler.add_job(self.check_all_prices, 'interval', hours=self.interval_hours)
+            self.scheduler.add_job(self.check_due, 'interval', seconds=self.tick_seconds)
+            if self.maintenance_window:
+                self.scheduler.add_job(self.run_maintenance, 'cron', hour=self.maintenance_window[0], jitter=600)
             self.scheduler.start()
             self._is_running = True
-            logger.info(f"Scheduler started with {self.interval_hours}h interval.")
+            logger.info(
+                "Scheduler started: base interval %sh, %s requests/min, tick every %ss.",
+                self.interval_hours, self.requests_per_minute, self.tick_seconds,
+            )
 
     def stop(self):
         if self._is_running:
             self.scheduler.shutdown()
             self._is_running = False
             logger.info("Scheduler stopped.")
+
+    async def close(self):
+        """Stop the scheduler, flush notifications, save scraper state and release pooled HTTP connections."""
+        self.stop()
+        await self.notifications.close()
+        await self.repository.call(self.session.save_state)
+        await self.session.close()
@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime
+from typing import Optional
+
+from core.jobs import HEARTBEAT_SECONDS, JOB_BATCH_SIZE, LEASE_SECONDS, QUEUE_TARGET, JobQueue
+from core.polling import REQUESTS_PER_MINUTE, change_rates
+from core.repository import AsyncRepository
+from services.scheduler import PriceScheduler
+from utils.helpers import child_log_queue, init_child_logging, setup_logger
+
+logger = setup_logger(__name__)
+
+# How long a worker waits before polling an empty queue again
+IDLE_SECONDS = 15
+
+class ScrapeWorker:
+    """
+    Scrapes products claimed from the shared job queue.
+
+    Any number of workers (processes, possibly on several hosts sharing the
+    database) can run side by side: each tops up the queue with due
+    products, leases a batch, scrapes and saves it through the scheduler's
+    cycle (history, rescheduling, notifications) while renewing the lease,
+    then deletes the jobs. requests_per_minute paces this worker only.
+    """
+
+    def __init__(
+        self,
+        owner: Optional[str] = None,
+        batch_size: int = JOB_BATCH_SIZE,
+        interval_hours: float = 1,
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        lease_seconds: int = LEASE_SECONDS,
+    ):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.requests_per_minute = requests_per_minute
+        self.queue = JobQueue(lease_seconds, interval_hours=interval_hours)
+        self.heartbeat_seconds = min(HEARTBEAT_SECONDS, lease_seconds / 3)
+        self.repository = AsyncRepository()
+        # Never started: only its scrape cycle is used
+        self.scheduler = PriceScheduler(interval_hours, repository=self.repository)
+        self.processed = 0
+
+    async def run_once(self) -> int:
+        """Claims and scrapes one batch; returns the number of products processed."""
+        await self.repository.call(self.queue.enqueue_due, QUEUE_TARGET)
+        token, products = await self.repository.call(self.queue.claim, self.owner, self.batch_size)
+        if not products:
+            return 0
+        rates = await self.repository.run(change_rates, [p.id for p in products], datetime.utcnow())
+        heartbeat = asyncio.create_task(self._heartbeat(token))
+        try:
+            await self.scheduler.run_cycle(products, rates)
+        except BaseException:
+            heartbeat.cancel()
+            await self.repository.call(self.queue.release, token)
+            raise
+        heartbeat.cancel()
+        await self.repository.call(self.queue.complete, token)
+        self.processed += len(products)
+        return len(products)
+
+    async def _heartbeat(self, token: str):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self.repository.call(self.queue.heartbeat, token)
+            except Exception as e:
+                logger.error("Error renewing lease %s: %s", token, e)
+
+    async def run(self, stop: asyncio.Event):
+        """Processes batches until stop is set; a running batch is always finished."""
+        logger.info("Worker %s started.", self.owner)
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                count = await self.run_once()
+            except Exception as e:
+                logger.error("Worker %s error: %s", self.owner, e)
+                count = 0
+            # Stay within this worker's request budget; idle when the queue is empty
+            if count:
+                wait = count * 60 / self.requests_per_minute - (time.monotonic() - started)
+            else:
+                wait = IDLE_SECONDS
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Worker %s stopped after %s products.", self.owner, self.processed)
+
+    async def close(self):
+        await self.scheduler.close()
+        self.scheduler.session.parse_pool.shutdown()
+        self.repository.shutdown()
+
+async def _serve(worker: ScrapeWorker):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    try:
+        await worker.run(stop)
+    finally:
+        await worker.close()
+
+def _worker_process(
+    index: int, batch_size: int, interval_hours: float, requests_per_minute: int, lease_seconds: int, log_queue=None
+):
+    if log_queue is not None:
+        init_child_logging(log_queue)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    worker = ScrapeWorker(owner, batch_size, interval_hours, requests_per_minute, lease_seconds)
+    asyncio.run(_serve(worker))
+
+def run_workers(
+    processes: int = 1,
+    batch_size: int = JOB_BATCH_SIZE,
+    interval_hours: float = 1,
+    requests_per_minute: int = REQUESTS_PER_MINUTE,
+    lease_seconds: int = LEASE_SECONDS,
+):
+    """
+    Runs worker processes on this host until SIGTERM/SIGINT. The
+    requests_per_minute budget is split evenly between them.
+    """
+    from core.migration import initialize_database
+
+    initialize_database()
+    if processes == 1:
+        _worker_process(0, batch_size, interval_hours, requests_per_minute, lease_seconds)
+        return
+
+    per_process = max(1, requests_per_minute // processes)
+    context = multiprocessing.get_context("spawn")
+    log_queue = child_log_queue()
+    children = [
+        context.Process(
+            target=_worker_process,
+            args=(i, batch_size, interval_hours, per_process, lease_seconds, log_queue),
+            name=f"scrape-worker-{i}",
+        )
+        for i in range(processes)
+    ]
+    for child in children:
+        child.start()
+    logger.info("Started %s worker processes.", processes)
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                child.terminate()  # SIGTERM: finish the current batch, then exit
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        child.join()
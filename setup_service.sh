@@ -1,15 +1,49 @@
 #!/bin/bash
 
 # Setup script for Price Tracker on Ubuntu/Linux
+#
+#   ./setup_service.sh            desktop entry, optional autostart and daemon
+#   ./setup_service.sh --daemon   headless servers: only the systemd user service
 
 APP_NAME="PriceTracker"
 APP_DIR=$(pwd)
 PYTHON_EXEC=$(which python3)
 ICON_PATH="$APP_DIR/icon.png" # Assuming an icon exists or we use a default
 DESKTOP_FILE="$HOME/.local/share/applications/price_tracker.desktop"
+SERVICE_FILE="$HOME/.config/systemd/user/price-tracker.service"
+
+install_daemon() {
+    # Runs the headless scheduler; the GUI detects it and acts as a client
+    mkdir -p "$(dirname "$SERVICE_FILE")"
+    cat <<EOF > "$SERVICE_FILE"
+[Unit]
+Description=Price Tracker daemon
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+Type=simple
+WorkingDirectory=$APP_DIR
+ExecStart=$PYTHON_EXEC $APP_DIR/main.py daemon
+Restart=on-failure
+RestartSec=30
+
+[Install]
+WantedBy=default.target
+EOF
+    systemctl --user daemon-reload
+    systemctl --user enable --now price-tracker.service
+    echo "Installed and started the price-tracker user service."
+    echo "To keep it running without a login session: sudo loginctl enable-linger $USER"
+}
 
 echo "Setting up $APP_NAME..."
 
+if [[ "$1" == "--daemon" ]]; then
+    install_daemon
+    exit 0
+fi
+
 # Create desktop entry
 cat <<EOF > "$DESKTOP_FILE"
 [Desktop Entry]
@@ -35,4 +69,11 @@ if [[ $REPLY =~ ^[Yy]$ ]]; then
     echo "Added to autostart."
 fi
 
+# Background checks without the GUI open
+read -p "Do you want to run price checks in a background systemd service? (y/n) " -n 1 -r
+echo
+if [[ $REPLY =~ ^[Yy]$ ]]; then
+    install_daemon
+fi
+
 echo "Setup complete! You can find Price Tracker in your application menu."
@@ -0,0 +1,46 @@
+import pytest
+
+from core.extraction import StreamExtractor, compile_chain
+from core.parsing import COMMON_PRICE_SELECTORS, TRENDYOL_SELECTORS, extract_prices
+
+CHAINS = [
+    ["span.price", "span.current-price"],
+    TRENDYOL_SELECTORS + COMMON_PRICE_SELECTORS,
+    ["div.product span.price"] + COMMON_PRICE_SELECTORS,
+]
+
+PAGES = {
+    "nested": b'<html><body><span class="price"><span class="price">1</span>2</span></body></html>',
+    "nested deeper": (
+        b'<div class="product"><span class="price"><b>3</b><span class="price">4</span>'
+        b'<span class="current-price">5</span></span></div>'
+    ),
+    "duplicates": b'<div><span class="price">5,00</span><span class="price">7</span></div>',
+    "first unparsable": (
+        b'<div><span class="price">n/a</span><span class="price">7</span>'
+        b'<span class="current-price">9</span></div>'
+    ),
+    "later selector first": (
+        b'<span class="prc-org">150</span><span class="prc-dsc">120</span><span class="prc-dsc">99</span>'
+    ),
+    "meta content": b'<head><meta itemprop="price" content="42.50"></head><body><p>no price</p></body>',
+    "no match": b"<html><body><p>Sold out</p></body></html>",
+}
+
+def _stream(body: bytes, chains, chunk_size: int):
+    extractor = StreamExtractor([compile_chain(chain) for chain in chains])
+    for start in range(0, len(body), chunk_size):
+        if extractor.feed(body[start:start + chunk_size]):
+            break
+    extractor.close()
+    return extractor.results()
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_streaming_matches_extract_prices(name, chunk_size):
+    body = PAGES[name]
+    assert _stream(body, CHAINS, chunk_size) == extract_prices(body, CHAINS)
+
+def test_nested_match_uses_outer_element():
+    text, price, winner = _stream(PAGES["nested"], [["span.price"]], 1 << 16)[0]
+    assert (text, price, winner) == ("12", 12.0, "span.price")
@@ -4,56 +4,59 @@ import logging
 
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton,
-    QTableWidget, QTableWidgetItem, QHeaderView, QLabel, QMessageBox,
-    QSplitter, QProgressBar, QStatusBar
+    QTableView, QHeaderView, QLabel, QMessageBox, QAbstractItemView,
+    QSplitter, QProgressBar, QStatusBar, QComboBox
 )
-from PyQt6.QtCore import Qt, pyqtSlot
+from PyQt6.QtCore import Qt, QTimer, pyqtSlot
 from PyQt6.QtGui import QColor, QAction
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-
-from qt_material import apply_stylesheet
-
-from core.database import SessionLocal
-from core.models import ProductModel, PriceHistoryModel
-from core.scraper import fetch_price
+from core.polling import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from core.repository import get_repository
 from services.scheduler import PriceScheduler
+from ui.price_graph import PriceGraph, prepare_series
+from ui.product_table import ProductTableModel
+from ui.stats_panel import StatsPanel
 from utils.helpers import setup_logger
+from utils.metrics import metrics
 
 logger = setup_logger(__name__)
 
-class PriceGraph(FigureCanvas):
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes = self.fig.add_subplot(111)
-        super().__init__(self.fig)
-        self.setParent(parent)
-
-    def plot(self, timestamps, prices, product_name):
-        self.axes.clear()
-        self.axes.plot(timestamps, prices, marker='o', linestyle='-', color='teal')
-        self.axes.set_title(f"Price History: {product_name}")
-        self.axes.set_xlabel("Date")
-        self.axes.set_ylabel("Price")
-        self.axes.grid(True)
-        self.fig.autofmt_xdate()
-        self.draw()
+# In client mode (a daemon does the scheduled checks), how often the product list is re-read
+CLIENT_RELOAD_MS = 60_000
+# Quiet period after the last selection change before the chart is updated
+SELECTION_DEBOUNCE_MS = 100
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, client_mode: bool = False):
         super().__init__()
         self.setWindowTitle("🛒 Price Tracker")
         self.resize(1200, 800)
 
-        # Initialize Scheduler
-        self.scheduler = PriceScheduler(interval_hours=1)
-        self.scheduler.start()
+        # All database access goes through the repository's DB thread
+        self.repository = get_repository()
+        self._selected_product_id = None
+        self._selected_product_name = None
+
+        # Initialize Scheduler. In client mode a daemon runs the scheduled
+        # checks on the same database; the scheduler only serves manual refreshes.
+        self.client_mode = client_mode
+        self.scheduler = PriceScheduler(interval_hours=1, repository=self.repository)
+        if not client_mode:
+            self.scheduler.start()
 
         self.setup_ui()
         self.load_data()
 
+        if client_mode:
+            self.reload_timer = QTimer(self)
+            self.reload_timer.setInterval(CLIENT_RELOAD_MS)
+            self.reload_timer.timeout.connect(self.reload_prices)
+            self.reload_timer.start()
+            self.statusBar().showMessage("Client mode: scheduled checks run in the background daemon.")
+
+        # Rows are updated in place as results land, from any cycle
+        self.scheduler.result_callbacks.append(self.on_scrape_result)
+
     def setup_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -69,12 +72,25 @@ class MainWindow(QMainWindow):
         self.url_input.setPlaceholderText("Product URL")
         self.selector_input = QLineEdit()
         self.selector_input.setPlaceholderText("CSS Selector (Optional)")
+        self.priority_input = QComboBox()
+        for label, priority in (("Normal", PRIORITY_NORMAL), ("High", PRIORITY_HIGH), ("Low", PRIORITY_LOW)):
+            self.priority_input.addItem(label, priority)
+        self.target_input = QLineEdit()
+        self.target_input.setPlaceholderText("Target Price (Optional)")
         
         add_btn = QPushButton("Add Product")
         add_btn.clicked.connect(self.add_product)
         
         refresh_btn = QPushButton("Refresh All")
         refresh_btn.clicked.connect(self.refresh_all)
+
+        stats_btn = QPushButton("Stats")
+        stats_btn.setCheckable(True)
+        stats_btn.toggled.connect(self.toggle_stats)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter products")
+        self.filter_input.textChanged.connect(self.filter_changed)
         
         input_layout.addWidget(QLabel("Name:"))
         input_layout.addWidget(self.name_input)
@@ -82,8 +98,13 @@ class MainWindow(QMainWindow):
         input_layout.addWidget(self.url_input)
         input_layout.addWidget(QLabel("Selector:"))
         input_layout.addWidget(self.selector_input)
+        input_layout.addWidget(QLabel("Priority:"))
+        input_layout.addWidget(self.priority_input)
+        input_layout.addWidget(self.target_input)
         input_layout.addWidget(add_btn)
         input_layout.addWidget(refresh_btn)
+        input_layout.addWidget(stats_btn)
+        input_layout.addWidget(self.filter_input)
         
         main_layout.addWidget(input_widget)
 
@@ -91,18 +112,32 @@ class MainWindow(QMainWindow):
         splitter = QSplitter(Qt.Orientation.Vertical)
         
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["ID", "Product Name", "Current Price", "Last Updated"])
+        self.model = ProductTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.table.verticalHeader().setVisible(False)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.itemSelectionChanged.connect(self.selection_changed)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.selectionModel().selectionChanged.connect(self.selection_changed)
+        # Scrolling through the table only renders the product it stops on
+        self.selection_timer = QTimer(self)
+        self.selection_timer.setSingleShot(True)
+        self.selection_timer.setInterval(SELECTION_DEBOUNCE_MS)
+        self.selection_timer.timeout.connect(self.show_selected)
         
         splitter.addWidget(self.table)
         
         # Graph
         self.graph = PriceGraph(self, width=8, height=4)
         splitter.addWidget(self.graph)
+
+        # Per-domain scrape statistics, hidden until toggled
+        self.stats_panel = StatsPanel(metrics, self)
+        self.stats_panel.setVisible(False)
+        splitter.addWidget(self.stats_panel)
         
         main_layout.addWidget(splitter)
 
@@ -116,74 +151,99 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage("Ready")
 
     def load_data(self):
-        db = SessionLocal()
+        asyncio.ensure_future(self.load_data_async())
+
+    async def load_data_async(self):
         try:
-            products = db.query(ProductModel).all()
-            self.table.setRowCount(len(products))
-            for i, p in enumerate(products):
-                self.table.setItem(i, 0, QTableWidgetItem(str(p.id)))
-                self.table.setItem(i, 1, QTableWidgetItem(p.name))
-                
-                # Get last price
-                last_history = db.query(PriceHistoryModel).filter(
-                    PriceHistoryModel.product_id == p.id
-                ).order_by(PriceHistoryModel.timestamp.desc()).first()
-                
-                if last_history:
-                    self.table.setItem(i, 2, QTableWidgetItem(f"{last_history.price:.2f}"))
-                    self.table.setItem(i, 3, QTableWidgetItem(last_history.timestamp.strftime("%Y-%m-%d %H:%M")))
-                else:
-                    self.table.setItem(i, 2, QTableWidgetItem("N/A"))
-                    self.table.setItem(i, 3, QTableWidgetItem("Never"))
-        finally:
-            db.close()
+            self.model.load(await self.repository.list_products())
+        except Exception as e:
+            logger.error("Error loading products: %s", e)
+
+    def reload_prices(self):
+        asyncio.ensure_future(self.reload_prices_async())
+
+    async def reload_prices_async(self):
+        """Picks up prices and products written by the daemon without resetting the table."""
+        try:
+            changed = self.model.merge(await self.repository.list_products())
+        except Exception as e:
+            logger.error("Error reloading products: %s", e)
+            return
+        # Cached chart series of products the daemon checked are out of date
+        for product_id in changed:
+            self.graph.cache.evict(product_id)
+        if self._selected_product_id in changed:
+            await self.show_history(self._selected_product_id, self._selected_product_name)
+
+    def toggle_stats(self, checked):
+        self.stats_panel.setVisible(checked)
+
+    def filter_changed(self, text):
+        self.model.set_filter(text)
+
+    def on_scrape_result(self, result):
+        if result.price is not None:
+            self.model.update_price(result.product_id, result.price)
+            self.graph.append_point(result.product_id, datetime.utcnow(), result.price)
 
     @pyqtSlot()
     def add_product(self):
         name = self.name_input.text().strip()
         url = self.url_input.text().strip()
         selector = self.selector_input.text().strip() or None
+        priority = self.priority_input.currentData()
+        target = self.target_input.text().strip().replace(",", ".")
         
         if not name or not url:
             QMessageBox.warning(self, "Missing Data", "Please enter name and URL.")
             return
+        try:
+            target_price = float(target) if target else None
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Target", "Target price must be a number.")
+            return
             
-        db = SessionLocal()
+        asyncio.ensure_future(self.save_product(name, url, selector, priority, target_price))
+
+    async def save_product(self, name, url, selector, priority=None, target_price=None):
         try:
-            product = ProductModel(name=name, url=url, selector=selector)
-            db.add(product)
-            db.commit()
+            product_id, product_name = await self.repository.add_product(name, url, selector, priority, target_price)
             self.name_input.clear()
             self.url_input.clear()
             self.selector_input.clear()
-            self.load_data()
+            self.target_input.clear()
+            self.model.add_product(product_id, product_name)
             self.statusBar().showMessage(f"Product '{name}' added.", 5000)
         except Exception as e:
-            logger.error(f"Error adding product: {e}")
-            db.rollback()
-        finally:
-            db.close()
+            logger.error("Error adding product: %s", e)
 
     def selection_changed(self):
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        self.selection_timer.start()
+
+    def show_selected(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
             return
         
-        product_id = int(self.table.item(selected_items[0].row(), 0).text())
-        product_name = self.table.item(selected_items[0].row(), 1).text()
-        
-        db = SessionLocal()
-        try:
-            history = db.query(PriceHistoryModel).filter(
-                PriceHistoryModel.product_id == product_id
-            ).order_by(PriceHistoryModel.timestamp.asc()).all()
-            
-            if history:
-                timestamps = [h.timestamp for h in history]
-                prices = [h.price for h in history]
-                self.graph.plot(timestamps, prices, product_name)
-        finally:
-            db.close()
+        product_id, product_name = self.model.product_at(rows[0].row())
+        self._selected_product_id = product_id
+        self._selected_product_name = product_name
+        asyncio.ensure_future(self.show_history(product_id, product_name))
+
+    async def show_history(self, product_id, product_name):
+        budget = self.graph.point_budget()
+        series = self.graph.cache.get(product_id, budget)
+        if series is None:
+            try:
+                raw = await self.repository.get_series(product_id, max_points=budget)
+            except Exception as e:
+                logger.error("Error loading history for product %s: %s", product_id, e)
+                return
+            series = self.graph.cache.put(product_id, prepare_series(raw.timestamps, raw.prices, budget))
+        # Ignore results for a product that is no longer selected
+        if product_id != self._selected_product_id:
+            return
+        self.graph.show_series(product_id, series, product_name)
 
     @pyqtSlot()
     def refresh_all(self):
@@ -193,32 +253,25 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.statusBar().showMessage("Refreshing prices...")
-        
-        db = SessionLocal()
-        try:
-            products = db.query(ProductModel).all()
-            total = len(products)
-            if total == 0:
-                self.progress_bar.setVisible(False)
-                return
 
-            for i, p in enumerate(products):
-                _, price = await fetch_price(p.url, p.selector)
-                if price is not None:
-                    history = PriceHistoryModel(product_id=p.id, price=price)
-                    db.add(history)
-                self.progress_bar.setValue(int(((i + 1) / total) * 100))
-            
-            db.commit()
-            self.load_data()
+        def on_progress(done, total, result):
+            self.progress_bar.setValue(int((done / total) * 100))
+
+        try:
+            # Shares the scheduler's session, so a refresh during a scheduled
+            # check joins its in-flight requests instead of repeating them
+            await self.scheduler.check_all_prices(progress_callback=on_progress)
             self.statusBar().showMessage("Refresh complete.", 5000)
         except Exception as e:
-            logger.error(f"Error in manual refresh: {e}")
-            db.rollback()
+            logger.error("Error in manual refresh: %s", e)
         finally:
-            db.close()
             self.progress_bar.setVisible(False)
 
     def closeEvent(self, event):
         self.scheduler.stop()
+        asyncio.ensure_future(self.shutdown())
         super().closeEvent(event)
+
+    async def shutdown(self):
+        await self.scheduler.close()
+        self.scheduler.session.parse_pool.shutdown()
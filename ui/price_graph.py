@@ -0,0 +1,158 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+from utils.metrics import LOCAL, metrics
+
+# Prepared series kept for recently viewed products
+SERIES_CACHE_SIZE = 64
+# Free space right of the last point, as a fraction of the time span, so new points can be blitted in
+APPEND_HEADROOM = 0.1
+
+class PreparedSeries(NamedTuple):
+    """A product's history as plot-ready arrays (matplotlib date numbers, prices)."""
+    x: np.ndarray
+    y: np.ndarray
+    point_budget: int
+
+def prepare_series(timestamps: List[datetime], prices: List[float], point_budget: int) -> PreparedSeries:
+    return PreparedSeries(
+        np.asarray(mdates.date2num(timestamps), dtype=float),
+        np.asarray(prices, dtype=float),
+        point_budget,
+    )
+
+class SeriesCache:
+    """LRU cache of prepared series by product id."""
+
+    def __init__(self, max_entries: int = SERIES_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, PreparedSeries]" = OrderedDict()
+
+    def get(self, product_id: int, point_budget: int) -> Optional[PreparedSeries]:
+        """The cached series, unless it was prepared for a different width."""
+        series = self._entries.get(product_id)
+        if series is None or series.point_budget != point_budget:
+            return None
+        self._entries.move_to_end(product_id)
+        return series
+
+    def put(self, product_id: int, series: PreparedSeries) -> PreparedSeries:
+        self._entries[product_id] = series
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return series
+
+    def evict(self, product_id: int):
+        """Drops a product's series, e.g. after another process recorded new prices."""
+        self._entries.pop(product_id, None)
+
+    def append(self, product_id: int, timestamp: datetime, price: float) -> Optional[PreparedSeries]:
+        """Adds a freshly scraped point to a cached series (without changing its LRU position)."""
+        series = self._entries.get(product_id)
+        if series is None:
+            return None
+        series = series._replace(
+            x=np.append(series.x, mdates.date2num(timestamp)),
+            y=np.append(series.y, price),
+        )
+        self._entries[product_id] = series
+        return series
+
+class PriceGraph(FigureCanvas):
+    """
+    Price history chart.
+
+    The axes and line are created once and only their data changes between
+    products. Full redraws go through draw_idle, so a burst of updates
+    renders once; a new point that fits the current view is blitted onto
+    the cached background instead. Render times are recorded as
+    render_seconds (full) and blit_seconds (incremental).
+    """
+
+    def __init__(self, parent=None, width=5, height=4, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.axes = self.fig.add_subplot(111)
+        super().__init__(self.fig)
+        self.setParent(parent)
+
+        self.cache = SeriesCache()
+        self.product_id: Optional[int] = None
+        self._background = None
+
+        locator = mdates.AutoDateLocator()
+        self.axes.xaxis.set_major_locator(locator)
+        self.axes.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        self.axes.set_xlabel("Date")
+        self.axes.set_ylabel("Price")
+        self.axes.grid(True)
+        # Animated: left out of full draws and painted on top of the saved background
+        (self.line,) = self.axes.plot([], [], marker='o', linestyle='-', color='teal', animated=True)
+        self.mpl_connect("draw_event", self._on_draw)
+
+    def point_budget(self) -> int:
+        """Roughly one point per horizontal pixel."""
+        return max(100, self.width())
+
+    def show_series(self, product_id: int, series: PreparedSeries, product_name: str):
+        """
+        Switches the chart to a product, reusing the existing artists. A
+        product without history gets an empty chart, not the previous one.
+        """
+        self.product_id = product_id
+        self.line.set_data(series.x, series.y)
+        if len(series.x):
+            self.axes.set_title(f"Price History: {product_name}")
+        else:
+            self.axes.set_title(f"Price History: {product_name} (no prices yet)")
+        self._rescale(series)
+        self.draw_idle()
+
+    def append_point(self, product_id: int, timestamp: datetime, price: float):
+        """Adds a new point to the product's cached series, and to the chart if it is shown."""
+        series = self.cache.append(product_id, timestamp, price)
+        if series is None or product_id != self.product_id:
+            return
+        self.line.set_data(series.x, series.y)
+        x0, x1 = self.axes.get_xlim()
+        y0, y1 = self.axes.get_ylim()
+        x, y = series.x[-1], series.y[-1]
+        if self._background is None or not (x0 <= x <= x1 and y0 <= y <= y1):
+            self._rescale(series)
+            self.draw_idle()
+            return
+        started = time.perf_counter()
+        self.restore_region(self._background)
+        self.axes.draw_artist(self.line)
+        self.blit(self.axes.bbox)
+        metrics.observe("blit_seconds", LOCAL, time.perf_counter() - started)
+
+    def _rescale(self, series: PreparedSeries):
+        if not len(series.x):
+            return
+        self.axes.relim()
+        self.axes.autoscale_view()
+        left, right = series.x.min(), series.x.max()
+        span = right - left
+        if span > 0:
+            self.axes.set_xlim(left - span * 0.02, right + span * APPEND_HEADROOM)
+
+    def draw(self):
+        started = time.perf_counter()
+        super().draw()
+        metrics.observe("render_seconds", LOCAL, time.perf_counter() - started)
+
+    def _on_draw(self, event):
+        self._background = self.copy_from_bbox(self.fig.bbox)
+        self.axes.draw_artist(self.line)
+
+    def resizeEvent(self, event):
+        self._background = None
+        super().resizeEvent(event)
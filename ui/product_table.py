@@ -0,0 +1,180 @@
+import math
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+HEADERS = ["ID", "Product Name", "Current Price", "Last Updated"]
+
+class ProductTableModel(QAbstractTableModel):
+    """
+    Product list backed by a compact column store.
+
+    Cells are only formatted when the view asks for them (i.e. for visible
+    rows). Sorting and filtering reorder an index array instead of the data,
+    and single products can be updated in place as scrape results arrive.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Column store
+        self._ids = array("q")
+        self._names: List[str] = []
+        self._prices = array("d")  # NaN = no price yet
+        self._checked: List[Optional[datetime]] = []
+        self._row_of: Dict[int, int] = {}  # product id -> store index
+
+        # Visible rows as store indices, after filter and sort
+        self._view = array("l")
+        self._view_pos: Dict[int, int] = {}  # store index -> view row
+        self._filter = ""
+        self._sort_column = 0
+        self._sort_order = Qt.SortOrder.AscendingOrder
+
+    # Loading and updates
+
+    def load(self, rows):
+        """Replaces the contents with (id, name, ..., last_price, last_checked) rows."""
+        self.beginResetModel()
+        self._ids = array("q")
+        self._names = []
+        self._prices = array("d")
+        self._checked = []
+        self._row_of = {}
+        for row in rows:
+            self._append(row.id, row.name, row.last_price, row.last_checked)
+        self._view = self._compute_view()
+        self._rebuild_positions()
+        self.endResetModel()
+
+    def merge(self, rows) -> List[int]:
+        """
+        Applies changed prices in place and appends products that are new.
+        Returns the ids of known products that were checked since.
+        """
+        changed = []
+        for row in rows:
+            store_index = self._row_of.get(row.id)
+            if store_index is None:
+                self.add_product(row.id, row.name, row.last_price, row.last_checked)
+            elif row.last_price is not None and row.last_checked != self._checked[store_index]:
+                self.update_price(row.id, row.last_price, row.last_checked)
+                changed.append(row.id)
+        return changed
+
+    def add_product(self, product_id: int, name: str, price: Optional[float] = None, checked: Optional[datetime] = None):
+        store_index = self._append(product_id, name, price, checked)
+        if self._matches(store_index):
+            row = len(self._view)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._view.append(store_index)
+            self._view_pos[store_index] = row
+            self.endInsertRows()
+
+    def update_price(self, product_id: int, price: float, checked: Optional[datetime] = None):
+        """Updates one product's price in place; the row keeps its position until the next sort."""
+        store_index = self._row_of.get(product_id)
+        if store_index is None:
+            return
+        self._prices[store_index] = price
+        self._checked[store_index] = checked or datetime.utcnow()
+        row = self._view_pos.get(store_index)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 2), self.index(row, 3))
+
+    def product_at(self, row: int) -> Tuple[int, str]:
+        store_index = self._view[row]
+        return self._ids[store_index], self._names[store_index]
+
+    def _append(self, product_id, name, price, checked) -> int:
+        store_index = len(self._ids)
+        self._ids.append(product_id)
+        self._names.append(name or "")
+        self._prices.append(math.nan if price is None else price)
+        self._checked.append(checked)
+        self._row_of[product_id] = store_index
+        return store_index
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._view)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        store_index = self._view[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(self._ids[store_index])
+        if column == 1:
+            return self._names[store_index]
+        if column == 2:
+            price = self._prices[store_index]
+            return "N/A" if math.isnan(price) else f"{price:.2f}"
+        checked = self._checked[store_index]
+        return checked.strftime("%Y-%m-%d %H:%M") if checked else "Never"
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._relayout()
+
+    # Filtering and sorting
+
+    def set_filter(self, text: str):
+        self._filter = text.strip().lower()
+        self._relayout()
+
+    def _matches(self, store_index: int) -> bool:
+        return not self._filter or self._filter in self._names[store_index].lower()
+
+    def _sort_value(self, column: int, store_index: int):
+        """Sort value of a cell, or None when it has no value yet."""
+        if column == 0:
+            return self._ids[store_index]
+        if column == 1:
+            return self._names[store_index].lower()
+        if column == 2:
+            price = self._prices[store_index]
+            return None if math.isnan(price) else price
+        return self._checked[store_index]
+
+    def _compute_view(self) -> array:
+        keyed, missing = [], []
+        for i in range(len(self._ids)):
+            if not self._matches(i):
+                continue
+            value = self._sort_value(self._sort_column, i)
+            if value is None:
+                missing.append(i)
+            else:
+                keyed.append((value, i))
+        keyed.sort(reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+        # Products without a value always sort last
+        return array("l", [i for _, i in keyed] + missing)
+
+    def _rebuild_positions(self):
+        self._view_pos = {store_index: row for row, store_index in enumerate(self._view)}
+
+    def _relayout(self):
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        old_store = [self._view[i.row()] for i in old]
+        self._view = self._compute_view()
+        self._rebuild_positions()
+        new = []
+        for index, store_index in zip(old, old_store):
+            row = self._view_pos.get(store_index)
+            new.append(QModelIndex() if row is None else self.index(row, index.column()))
+        self.changePersistentIndexList(old, new)
+        self.layoutChanged.emit()
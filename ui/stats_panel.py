@@ -0,0 +1,84 @@
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QHeaderView, QLabel, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+
+from utils.metrics import LOCAL, Metrics
+
+REFRESH_MS = 2000
+
+# (header, metric, summary field, scale)
+COLUMNS = [
+    ("Requests", "fetch_seconds", "count", 1),
+    ("Fetch p50 (ms)", "fetch_seconds", "p50", 1000),
+    ("Fetch p95 (ms)", "fetch_seconds", "p95", 1000),
+    ("Connect (ms)", "connect_seconds", "mean", 1000),
+    ("Wait (ms)", "wait_seconds", "mean", 1000),
+    ("Parse (ms)", "parse_seconds", "mean", 1000),
+    ("KB", "bytes", "mean", 1 / 1024),
+    ("Selectors", "selector_attempts", "mean", 1),
+]
+# (header, counter): shown as "label: count" lists
+COUNTER_COLUMNS = [("Status", "status"), ("Errors", "errors"), ("Throttle", "throttle"), ("Shared", "coalesced")]
+
+class StatsPanel(QWidget):
+    """Per-domain scrape statistics, refreshed from the metrics registry while visible."""
+
+    def __init__(self, metrics: Metrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.summary = QLabel()
+        layout.addWidget(self.summary)
+
+        headers = ["Domain"] + [c[0] for c in COLUMNS] + [c[0] for c in COUNTER_COLUMNS]
+        self.table = QTableWidget(0, len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        if not self.metrics.enabled:
+            self.summary.setText("Metrics are disabled (PRICE_TRACKER_METRICS=0).")
+            return
+        snapshot = self.metrics.snapshot()
+        local = snapshot.pop(LOCAL, {})
+        self.summary.setText(" | ".join(
+            f"{label}: {local[name]['mean'] * 1000:.0f} ms avg ({local[name]['count']})"
+            for label, name in (
+                ("Cycle", "cycle_seconds"), ("DB write", "db_write_seconds"), ("Chart", "render_seconds"),
+            )
+            if name in local
+        ) or "No cycles yet.")
+
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(snapshot))
+        for row, (domain, stats) in enumerate(sorted(snapshot.items())):
+            self.table.setItem(row, 0, QTableWidgetItem(domain))
+            for column, (_, name, field, scale) in enumerate(COLUMNS, start=1):
+                item = QTableWidgetItem()
+                if name in stats:
+                    value = stats[name][field] * scale
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(value, 1) if field != "count" else int(value))
+                self.table.setItem(row, column, item)
+            for column, (_, name) in enumerate(COUNTER_COLUMNS, start=len(COLUMNS) + 1):
+                counts = stats.get(name, {})
+                self.table.setItem(row, column, QTableWidgetItem(
+                    ", ".join(f"{label}: {n}" for label, n in sorted(counts.items()))
+                ))
+        self.table.setSortingEnabled(True)
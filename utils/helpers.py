@@ -1,21 +1,180 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
 import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Logging configuration, from the environment
+LOG_FILE = os.environ.get("PRICE_TRACKER_LOG_FILE", "price_tracker.log")
+LOG_LEVEL = os.environ.get("PRICE_TRACKER_LOG_LEVEL", "INFO")
+# Per-module levels, e.g. "core.scraper=WARNING,services.scheduler=DEBUG"
+LOG_LEVELS = os.environ.get("PRICE_TRACKER_LOG_LEVELS", "")
+# "text" or "json" (one object per line)
+LOG_FORMAT = os.environ.get("PRICE_TRACKER_LOG_FORMAT", "text")
+# "size" rotates at LOG_MAX_BYTES; any TimedRotatingFileHandler "when" value ("midnight", "H", ...) rotates by time
+LOG_ROTATE = os.environ.get("PRICE_TRACKER_LOG_ROTATE", "size")
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# Top-level packages of this application; everything else (httpx, apscheduler, ...) logs at WARNING
+APP_LOGGERS = ("__main__", "__mp_main__", "core", "services", "ui", "utils", "benchmarks")
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Root handler installed by configure_logging, and the thread writing its records
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+# Records from child processes: queue they send to, and the thread writing them with this process's handlers
+_child_queue = None
+_child_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message (and exception)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread unformatted, so %-style messages
+    are only rendered off the calling thread. Tracebacks are rendered here,
+    while their frames still exist.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """"core.scraper=WARNING,services=DEBUG" -> {"core.scraper": 30, "services": 10}"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+def _file_handler(path: str, rotate: str) -> logging.Handler:
+    if rotate == "size":
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+        )
+    return logging.handlers.TimedRotatingFileHandler(
+        path, when=rotate, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+    )
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    module_levels: str = LOG_LEVELS,
+    log_format: str = LOG_FORMAT,
+    log_file: Optional[str] = LOG_FILE,
+    rotate: str = LOG_ROTATE,
+    forward_to=None,
+):
+    """
+    Sets up application logging once per process: loggers only put records
+    on a queue, and a listener thread formats them and writes to stdout and
+    the rotating log file. Later calls are no-ops.
+
+    Only the main process writes the log file. With forward_to (a queue from
+    child_log_queue) records go to the parent's listener instead; child
+    processes that were not given one log to stderr.
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is not None:
+            return
+        root = logging.getLogger()
+        root.setLevel(logging.WARNING)
+        app_level = logging.getLevelName(level.upper())
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(app_level if isinstance(app_level, int) else logging.INFO)
+        for name, module_level in parse_levels(module_levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        if forward_to is not None:
+            # The stock QueueHandler renders the message, so records pickle cleanly
+            _handler = logging.handlers.QueueHandler(forward_to)
+        else:
+            formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+            if multiprocessing.parent_process() is None:
+                handlers = [logging.StreamHandler(sys.stdout)]
+                if log_file:
+                    handlers.append(_file_handler(log_file, rotate))
+            else:
+                handlers = [logging.StreamHandler(sys.stderr)]
+            for handler in handlers:
+                handler.setFormatter(formatter)
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            _handler = _QueueHandler(log_queue)
+            _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _listener.start()
+        root.addHandler(_handler)
+    atexit.register(shutdown_logging)
+
+def child_log_queue():
+    """
+    Queue for child processes to log through (pass it to init_child_logging
+    in the child). Their records are written by this process's handlers, so
+    only one process ever writes and rotates the log file.
+    """
+    global _child_queue, _child_listener
+    configure_logging()
+    with _lock:
+        if _child_queue is None:
+            if isinstance(_handler, _QueueHandler):
+                _child_queue = multiprocessing.get_context("spawn").Queue()
+                _child_listener = logging.handlers.QueueListener(
+                    _child_queue, *_listener.handlers, respect_handler_level=True
+                )
+                _child_listener.start()
+            else:
+                # Already a child: grandchildren send to the same parent
+                _child_queue = _handler.queue
+        return _child_queue
+
+def init_child_logging(log_queue):
+    """Process initializer: sends this process's records to the queue from the parent's child_log_queue."""
+    shutdown_logging()
+    configure_logging(forward_to=log_queue)
+
+def shutdown_logging():
+    """Writes out queued records and stops the listener threads."""
+    global _handler, _listener, _child_queue, _child_listener
+    with _lock:
+        if _child_listener is not None:
+            _child_listener.stop()
+            _child_listener = None
+        _child_queue = None
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+        if _handler is not None:
+            logging.getLogger().removeHandler(_handler)
+            _handler = None
 
 def setup_logger(name: str) -> logging.Logger:
-    """Sets up a professional-grade logger."""
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
-    # Console handler
-    ch = logging.StreamHandler(sys.stdout)
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-    
-    # File handler
-    fh = logging.FileHandler('price_tracker.log')
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-    
-    return logger
+    """Returns the module's logger, configuring application logging on first use."""
+    configure_logging()
+    return logging.getLogger(name)
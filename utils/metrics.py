@@ -0,0 +1,246 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+# Set PRICE_TRACKER_METRICS=0 to turn instrumentation off
+METRICS_ENABLED = os.environ.get("PRICE_TRACKER_METRICS", "1") != "0"
+# Set PRICE_TRACKER_METRICS_PORT to serve /metrics (Prometheus text format) locally
+METRICS_PORT = int(os.environ.get("PRICE_TRACKER_METRICS_PORT", "0"))
+
+# Pseudo-domain for work that is not tied to a host (DB writes, UI)
+LOCAL = "local"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 1e7)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 20, 50, 100, 500, 1000)
+
+def _buckets_for(name: str) -> Tuple[float, ...]:
+    if name.endswith("_seconds"):
+        return SECONDS_BUCKETS
+    if name.endswith("bytes"):
+        return BYTES_BUCKETS
+    return COUNT_BUCKETS
+
+def domain_of(url: str) -> str:
+    return urlparse(url).netloc.lower() or LOCAL
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max."""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+        }
+
+class _Span:
+    __slots__ = ("metrics", "name", "domain", "started")
+
+    def __init__(self, metrics: "Metrics", name: str, domain: str):
+        self.metrics = metrics
+        self.name = name
+        self.domain = domain
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(f"{self.name}_seconds", self.domain, time.perf_counter() - self.started)
+        return False
+
+_NULL_SPAN = nullcontext()
+
+class RequestTrace:
+    """
+    httpx "trace" extension that times the connection phases of a request:
+    connect_seconds (DNS and TCP), tls_seconds and wait_seconds (request
+    sent until response headers, i.e. server think time).
+    """
+
+    PHASES = {
+        "connection.connect_tcp": "connect_seconds",
+        "connection.start_tls": "tls_seconds",
+        "http11.receive_response_headers": "wait_seconds",
+        "http2.receive_response_headers": "wait_seconds",
+    }
+
+    def __init__(self, metrics: "Metrics", domain: str):
+        self.metrics = metrics
+        self.domain = domain
+        self._started: Dict[str, float] = {}
+
+    async def __call__(self, event: str, info):
+        phase, _, state = event.rpartition(".")
+        name = self.PHASES.get(phase)
+        if name is None:
+            return
+        if state == "started":
+            self._started[phase] = time.perf_counter()
+        elif state in ("complete", "failed") and phase in self._started:
+            self.metrics.observe(name, self.domain, time.perf_counter() - self._started.pop(phase))
+
+class Metrics:
+    """
+    In-process metrics: timing spans and value histograms per (metric,
+    domain), plus labelled counters such as HTTP status codes.
+
+    When disabled every call returns immediately (spans are a shared no-op
+    context manager), so instrumented code pays almost nothing.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str, str], int] = {}
+
+    def span(self, name: str, domain: str = LOCAL):
+        """Times a block into the "<name>_seconds" histogram of a domain."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, domain)
+
+    def trace(self, domain: str) -> Optional[RequestTrace]:
+        return RequestTrace(self, domain) if self.enabled else None
+
+    def observe(self, name: str, domain: str, value: float):
+        if not self.enabled:
+            return
+        key = (name, domain)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(_buckets_for(name))
+            histogram.observe(value)
+
+    def incr(self, name: str, domain: str = LOCAL, label: object = "", amount: int = 1):
+        if not self.enabled:
+            return
+        key = (name, domain, str(label))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict]]:
+        """
+        Per-domain view: {domain: {metric: summary dict}} for histograms and
+        {domain: {counter: {label: count}}} for counters.
+        """
+        result: Dict[str, Dict[str, Dict]] = {}
+        with self._lock:
+            for (name, domain), histogram in self._histograms.items():
+                result.setdefault(domain, {})[name] = histogram.summary()
+            for (name, domain, label), value in self._counters.items():
+                result.setdefault(domain, {}).setdefault(name, {})[label] = value
+        return result
+
+    def render_text(self) -> str:
+        """Prometheus text exposition of all metrics."""
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        for (name, domain), h in histograms:
+            metric = f"price_tracker_{name}"
+            cumulative = 0
+            for bound, n in zip(h.bounds + (float("inf"),), h.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{metric}_bucket{{domain="{domain}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{domain="{domain}"}} {h.sum:.6f}')
+            lines.append(f'{metric}_count{{domain="{domain}"}} {h.count}')
+        for (name, domain, label), value in counters:
+            label_part = f',label="{label}"' if label else ""
+            lines.append(f'price_tracker_{name}_total{{domain="{domain}"{label_part}}} {value}')
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.render_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """Serves metrics.render_text() on http://host:port/metrics from a background thread."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        if self._server is not None:
+            return
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            logger.error("Could not start metrics endpoint on port %s: %s", self.port, e)
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        logger.info("Metrics available at http://%s:%s/metrics", self.host, self.port)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None